@@ -0,0 +1,143 @@
+"""Audio decoding helpers built on the ffmpeg command line tool"""
+import subprocess
+import numpy as np
+
+WHISPER_SAMPLE_RATE = 16000
+
+
+def _pcm_command(file_path, sample_rate, start=None, duration=None):
+    """ffmpeg command that writes mono s16le PCM for the audio stream to stdout"""
+    cmd = ['ffmpeg', '-nostdin', '-threads', '0', '-loglevel', 'error']
+    if start:
+        # Input-side seek: ffmpeg skips straight to `start` without decoding what precedes it
+        cmd += ['-ss', f'{start:.3f}']
+    cmd += ['-i', file_path]
+    if duration:
+        cmd += ['-t', f'{duration:.3f}']
+    cmd += [
+        '-vn', '-sn', '-dn',
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sample_rate),
+        '-',
+    ]
+    return cmd
+
+
+def _to_float(pcm):
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+
+
+def decode_audio(file_path, sample_rate=WHISPER_SAMPLE_RATE, start=None, duration=None):
+    """
+    Decode any audio/video file to mono float32 PCM at `sample_rate`
+
+    Only the audio stream is decoded; video, subtitle and data streams are dropped.
+    `start`/`duration` (seconds) restrict decoding to part of the file.
+    """
+    cmd = _pcm_command(file_path, sample_rate, start, duration)
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except FileNotFoundError:
+        raise Exception("ffmpeg is not installed or not on PATH")
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"Failed to decode audio: {e.stderr.decode(errors='ignore')[-500:]}")
+
+    return _to_float(out)
+
+
+def stream_audio(file_path, window_seconds, sample_rate=WHISPER_SAMPLE_RATE):
+    """
+    Yield consecutive mono float32 windows of `window_seconds` from an ffmpeg pipe
+
+    Only one window is held in memory at a time, whatever the input length.
+    Closing the generator early stops ffmpeg.
+    """
+    cmd = _pcm_command(file_path, sample_rate)
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise Exception("ffmpeg is not installed or not on PATH")
+
+    window_bytes = int(window_seconds * sample_rate) * 2
+    finished = False
+    try:
+        while True:
+            pcm = proc.stdout.read(window_bytes)
+            if not pcm:
+                finished = True
+                break
+            if len(pcm) % 2:
+                pcm += proc.stdout.read(1)
+            yield _to_float(pcm)
+    finally:
+        if not finished and proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        stderr = proc.stderr.read()
+        proc.stderr.close()
+        proc.wait()
+
+    if proc.returncode != 0:
+        raise Exception(f"Failed to decode audio: {stderr.decode(errors='ignore')[-500:]}")
+
+
+def probe_duration(file_path):
+    """Duration of a media file in seconds according to ffprobe, or None if unknown"""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        file_path,
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True, text=True).stdout.strip()
+        return float(out)
+    except (FileNotFoundError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def frame_energy(audio, sample_rate=WHISPER_SAMPLE_RATE, frame_ms=30):
+    """RMS energy of consecutive non-overlapping frames"""
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    usable = len(audio) - len(audio) % frame
+    if usable == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:usable].reshape(-1, frame)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def quietest_point(audio, start, end, sample_rate=WHISPER_SAMPLE_RATE, frame_ms=30, smooth_frames=10):
+    """
+    Sample index of the quietest stretch of audio[start:end]
+
+    Energy is smoothed over ~300 ms so the cut lands in a pause between
+    words rather than in a short dip inside one.
+    """
+    start = max(0, start)
+    end = min(len(audio), end)
+    energy = frame_energy(audio[start:end], sample_rate, frame_ms)
+    if len(energy) == 0:
+        return end
+    if len(energy) > smooth_frames:
+        energy = np.convolve(energy, np.ones(smooth_frames) / smooth_frames, mode='same')
+    frame = int(sample_rate * frame_ms / 1000)
+    return start + int(np.argmin(energy)) * frame + frame // 2
+
+
+def split_on_silence(audio, chunk_seconds, search_seconds=10, sample_rate=WHISPER_SAMPLE_RATE):
+    """
+    Split audio into (start, end) sample ranges of roughly `chunk_seconds`
+
+    Each cut is placed at the quietest point within `search_seconds` of the
+    nominal boundary.
+    """
+    chunk = int(chunk_seconds * sample_rate)
+    search = int(search_seconds * sample_rate)
+    bounds = []
+    start = 0
+    while len(audio) - start > chunk + search:
+        target = start + chunk
+        cut = quietest_point(audio, target - search, target + search, sample_rate)
+        bounds.append((start, cut))
+        start = cut
+    bounds.append((start, len(audio)))
+    return bounds
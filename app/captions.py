@@ -0,0 +1,128 @@
+"""Read existing YouTube subtitle tracks into the transcript format used by Whisper"""
+import json
+import re
+
+# Caption formats we can parse, in order of preference. json3 carries exact
+# timings without the rolling duplicate lines of auto-generated VTT.
+PARSEABLE_FORMATS = ('json3', 'vtt')
+
+_VTT_TIMING = re.compile(r'(\d+:)?(\d{2}):(\d{2})\.(\d{3})\s+-->\s+(\d+:)?(\d{2}):(\d{2})\.(\d{3})')
+_TAG = re.compile(r'<[^>]+>')
+
+
+def _language_matches(track_lang, wanted):
+    track_lang = track_lang.lower()
+    wanted = wanted.lower()
+    return track_lang == wanted or track_lang == f"{wanted}-orig" or track_lang.split('-')[0] == wanted
+
+
+def find_caption_track(info, languages):
+    """
+    Pick the best subtitle track from a yt-dlp info dict.
+
+    Manual subtitles win over automatic captions. Returns a dict with the
+    track's url, ext, language and whether it is auto-generated, or None.
+    """
+    wanted = [lang for lang in [info.get('language')] + list(languages) if lang]
+
+    for automatic, tracks in ((False, info.get('subtitles') or {}),
+                              (True, info.get('automatic_captions') or {})):
+        for lang in wanted:
+            for track_lang, formats in tracks.items():
+                if not _language_matches(track_lang, lang):
+                    continue
+                for ext in PARSEABLE_FORMATS:
+                    for fmt in formats:
+                        if fmt.get('ext') == ext and fmt.get('url'):
+                            return {
+                                'url': fmt['url'],
+                                'ext': ext,
+                                'language': track_lang,
+                                'automatic': automatic,
+                            }
+    return None
+
+
+def parse_json3(data):
+    """Parse YouTube's json3 timed-text format into segments"""
+    payload = json.loads(data)
+    segments = []
+    for event in payload.get('events', []):
+        segs = event.get('segs')
+        if not segs:
+            continue
+        text = ''.join(seg.get('utf8', '') for seg in segs).replace('\n', ' ').strip()
+        if not text:
+            continue
+        start = event.get('tStartMs', 0) / 1000.0
+        end = start + event.get('dDurationMs', 0) / 1000.0
+        segments.append({"start": start, "end": end, "text": text})
+    return segments
+
+
+def _vtt_seconds(hours, minutes, seconds, millis):
+    return int((hours or '0:')[:-1]) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000.0
+
+
+def parse_vtt(data):
+    """Parse WebVTT into segments, dropping the rolling repeats of auto captions"""
+    segments = []
+    last_line = None
+    cue = None
+
+    for raw_line in data.splitlines():
+        line = raw_line.strip()
+        timing = _VTT_TIMING.search(line)
+        if timing:
+            groups = timing.groups()
+            cue = {
+                "start": _vtt_seconds(*groups[:4]),
+                "end": _vtt_seconds(*groups[4:]),
+                "lines": [],
+            }
+            continue
+        if cue is None:
+            continue
+        if not line:
+            text = ' '.join(cue['lines']).strip()
+            if text:
+                segments.append({"start": cue['start'], "end": cue['end'], "text": text})
+            cue = None
+            continue
+
+        text = _TAG.sub('', line).strip()
+        if text and text != last_line:
+            cue['lines'].append(text)
+            last_line = text
+
+    if cue and cue['lines']:
+        segments.append({"start": cue['start'], "end": cue['end'], "text": ' '.join(cue['lines'])})
+    return segments
+
+
+def fetch_caption_transcript(ydl, info, languages):
+    """
+    Download and parse the best caption track for `info`.
+
+    Returns a transcript dict ({"text", "segments", "title", ...}) or None
+    when the video has no usable track.
+    """
+    track = find_caption_track(info, languages)
+    if not track:
+        return None
+
+    data = ydl.urlopen(track['url']).read().decode('utf-8', errors='replace')
+    segments = parse_json3(data) if track['ext'] == 'json3' else parse_vtt(data)
+    if not segments:
+        return None
+
+    return {
+        "text": ' '.join(segment['text'] for segment in segments),
+        "segments": segments,
+        "title": info.get('title'),
+        "source": "captions",
+        "caption_track": {
+            "language": track['language'],
+            "automatic": track['automatic'],
+        },
+    }
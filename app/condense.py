@@ -0,0 +1,171 @@
+"""Extractive transcript condensation: keep the most central sentences that fit a token budget"""
+import math
+import re
+import numpy as np
+
+# Rough English average for OpenAI tokenizers; close enough for budgeting a prompt
+CHARS_PER_TOKEN = 4
+# TextRank damping factor and iteration limits
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-6
+# Above this many sentences, neighbours are merged so the similarity matrix stays small
+MAX_UNITS = 2000
+# Marks where sentences were left out between two kept ones
+GAP_MARKER = ' ... '
+# Unpunctuated text (e.g. YouTube auto-captions) is cut into windows of this many words instead;
+# it is taken to be unpunctuated when its "sentences" average more words than MAX_SENTENCE_WORDS
+WINDOW_WORDS = 25
+MAX_SENTENCE_WORDS = 60
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+_WORD = re.compile(r"[a-z][a-z']+")
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just let like me
+more most my myself no nor not now of off on once only or other our ours ourselves out over own
+really right same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we well were what when where which
+while who whom why will with would yeah yes you your yours yourself yourselves okay oh um uh gonna
+going get got know think thing things say said want
+""".split())
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_sentences(text):
+    """Sentences of a transcript; Whisper punctuates, so end marks are reliable enough"""
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+def split_units(text):
+    """Sentences of `text`, or fixed word windows when it has too little punctuation to split on"""
+    sentences = split_sentences(text)
+    words = text.split()
+    if len(words) <= MAX_SENTENCE_WORDS or len(words) / max(1, len(sentences)) <= MAX_SENTENCE_WORDS:
+        return sentences
+    return [' '.join(words[i:i + WINDOW_WORDS]) for i in range(0, len(words), WINDOW_WORDS)]
+
+
+def _merge_units(sentences, max_units):
+    """Join consecutive sentences so there are at most `max_units` of them"""
+    if len(sentences) <= max_units:
+        return sentences
+    group = math.ceil(len(sentences) / max_units)
+    return [' '.join(sentences[i:i + group]) for i in range(0, len(sentences), group)]
+
+
+def _tfidf_matrix(units):
+    """L2-normalised TF-IDF rows, one per unit, over non-stopword terms"""
+    vocabulary = {}
+    rows, cols, counts = [], [], []
+    for row, unit in enumerate(units):
+        terms = {}
+        for word in _WORD.findall(unit.lower()):
+            if word not in STOPWORDS:
+                column = vocabulary.setdefault(word, len(vocabulary))
+                terms[column] = terms.get(column, 0) + 1
+        for column, count in terms.items():
+            rows.append(row)
+            cols.append(column)
+            counts.append(count)
+
+    matrix = np.zeros((len(units), max(1, len(vocabulary))), dtype=np.float32)
+    if counts:
+        matrix[rows, cols] = counts
+    document_frequency = np.count_nonzero(matrix, axis=0)
+    idf = np.log((1 + len(units)) / (1 + document_frequency)) + 1
+    matrix = np.log1p(matrix) * idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-9)
+
+
+def rank_sentences(units):
+    """
+    TextRank salience of each unit
+
+    Units are nodes in a graph weighted by TF-IDF cosine similarity; the
+    stationary distribution of a damped random walk on it favours
+    sentences that share vocabulary with many others, i.e. the main topics.
+    """
+    n = len(units)
+    if n < 3:
+        return np.ones(n, dtype=np.float32)
+    tfidf = _tfidf_matrix(units)
+    similarity = tfidf @ tfidf.T
+    np.fill_diagonal(similarity, 0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Units sharing no terms with anything jump uniformly instead of trapping the walk
+    transition = np.where(out_weight > 0, similarity / np.maximum(out_weight, 1e-9), 1.0 / n)
+
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(MAX_ITERATIONS):
+        updated = (1 - DAMPING) / n + DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < TOLERANCE:
+            scores = updated
+            break
+        scores = updated
+    return scores
+
+
+def top_sentences(text, count, max_chars=None):
+    """The `count` most salient distinct sentences of `text`, in their original order, each cut to `max_chars`"""
+    units = _merge_units(split_units(text), MAX_UNITS)
+    if not units:
+        return []
+    chosen = []
+    seen = set()
+    for index in np.argsort(-rank_sentences(units), kind='stable'):
+        # Repeated lines (intros, catchphrases) would otherwise fill every slot
+        if units[index].lower() not in seen:
+            seen.add(units[index].lower())
+            chosen.append(index)
+            if len(chosen) == count:
+                break
+    chosen.sort()
+    sentences = [units[index] for index in chosen]
+    if max_chars:
+        sentences = [s if len(s) <= max_chars else s[:max_chars - 1].rsplit(None, 1)[0] + '…' for s in sentences]
+    return sentences
+
+
+def condense_transcript(transcript, max_tokens):
+    """
+    The most salient sentences of `transcript` that fit in `max_tokens`
+
+    Distinct sentences (word windows for unpunctuated captions, see
+    split_units()) are picked by TextRank score and kept in their original
+    order, with GAP_MARKER where sentences were skipped. Transcripts that
+    already fit are returned unchanged.
+    """
+    if estimate_tokens(transcript) <= max_tokens:
+        return transcript
+    units = _merge_units(split_units(transcript), MAX_UNITS)
+    if len(units) < 2:
+        return transcript[:max_tokens * CHARS_PER_TOKEN]
+
+    scores = rank_sentences(units)
+    budget = max_tokens * CHARS_PER_TOKEN
+    chosen = []
+    seen = set()
+    used = 0
+    for index in np.argsort(-scores, kind='stable'):
+        # A repeated line scores as high as its first copy; one copy is enough
+        if units[index].lower() in seen:
+            continue
+        length = len(units[index]) + len(GAP_MARKER)
+        if used + length <= budget:
+            seen.add(units[index].lower())
+            chosen.append(index)
+            used += length
+
+    if not chosen:
+        return transcript[:budget]
+    chosen.sort()
+    pieces = [units[chosen[0]]]
+    for previous, index in zip(chosen, chosen[1:]):
+        pieces.append((' ' if index == previous + 1 else GAP_MARKER) + units[index])
+    return ''.join(pieces)
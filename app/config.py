@@ -18,7 +18,115 @@ class Config:
     
     # OpenAI API Key
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
-    
+    # Concurrent OpenAI requests per process; more wait for a slot
+    OPENAI_MAX_CONCURRENCY = int(os.environ.get('OPENAI_MAX_CONCURRENCY', 4))
+    OPENAI_TIMEOUT_SECONDS = float(os.environ.get('OPENAI_TIMEOUT_SECONDS', 60))
+    OPENAI_IMAGE_TIMEOUT_SECONDS = float(os.environ.get('OPENAI_IMAGE_TIMEOUT_SECONDS', 120))
+    # Retries on rate limits (429), server errors (5xx) and dropped connections
+    OPENAI_MAX_RETRIES = int(os.environ.get('OPENAI_MAX_RETRIES', 4))
+
+    # Whisper transcription
+    # "whisper" = reference openai-whisper, "faster-whisper" = CTranslate2 (int8 on CPU)
+    TRANSCRIBE_ENGINE = os.environ.get('TRANSCRIBE_ENGINE', 'whisper')
+    WHISPER_MODEL_SIZE = os.environ.get('WHISPER_MODEL_SIZE', 'base')
+    WHISPER_COMPUTE_TYPE = os.environ.get('WHISPER_COMPUTE_TYPE', 'int8')
+    # Inference threads per model (0 = library default)
+    TRANSCRIBE_THREADS = int(os.environ.get('TRANSCRIBE_THREADS', 0))
+    # Language hint such as "en"; skips auto-detection (empty = detect)
+    TRANSCRIBE_LANGUAGE = os.environ.get('TRANSCRIBE_LANGUAGE', '')
+    # Model size by duration, e.g. "600:small,1800:base,0:tiny" (empty = always WHISPER_MODEL_SIZE)
+    MODEL_TIERS = os.environ.get('MODEL_TIERS', '')
+    # Drop one tier for every this many jobs already queued or running
+    TIER_QUEUE_STEP = int(os.environ.get('TIER_QUEUE_STEP', 4))
+    # Comma-separated model sizes to load at startup (e.g. "base" or "tiny,base")
+    WHISPER_PRELOAD_MODELS = os.environ.get('WHISPER_PRELOAD_MODELS', '')
+    # "full" = single Whisper pass, "parallel" = silence-aligned chunks on a process pool,
+    # "streaming" = fixed-size windows read from an ffmpeg pipe (flat memory for long inputs),
+    # "budget" = stop once the budgets below are met, "sampled" = a few windows spread across the video
+    TRANSCRIBE_MODE = os.environ.get('TRANSCRIBE_MODE', 'full')
+    TRANSCRIBE_WORKERS = int(os.environ.get('TRANSCRIBE_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    PARALLEL_CHUNK_SECONDS = int(os.environ.get('PARALLEL_CHUNK_SECONDS', 300))
+    STREAM_WINDOW_SECONDS = int(os.environ.get('STREAM_WINDOW_SECONDS', 120))
+    # Budget mode: the post prompt only uses ~3000 characters of transcript (0 disables a budget)
+    TRANSCRIPT_CHAR_BUDGET = int(os.environ.get('TRANSCRIPT_CHAR_BUDGET', 3000))
+    TRANSCRIPT_TIME_BUDGET = int(os.environ.get('TRANSCRIPT_TIME_BUDGET', 0))
+    SAMPLE_WINDOWS = int(os.environ.get('SAMPLE_WINDOWS', 4))
+    SAMPLE_WINDOW_SECONDS = int(os.environ.get('SAMPLE_WINDOW_SECONDS', 60))
+    # Voice activity detection: only speech regions are sent to Whisper
+    VAD_ENABLED = os.environ.get('VAD_ENABLED', 'true').lower() == 'true'
+    # Loudness threshold as a fraction of the way from the noise floor to the loud frames
+    VAD_THRESHOLD = float(os.environ.get('VAD_THRESHOLD', 0.3))
+    # Minimum share of a frame's energy in the 300-3400 Hz speech band
+    VAD_MIN_BAND_RATIO = float(os.environ.get('VAD_MIN_BAND_RATIO', 0.4))
+    # Minimum loudness fluctuation (dB over ~1 s); sustained music is flatter than speech
+    VAD_MIN_MODULATION_DB = float(os.environ.get('VAD_MIN_MODULATION_DB', 3.0))
+    # Frames quieter than this (RMS, dBFS) are silence however the rest of the window sounds
+    VAD_SILENCE_DBFS = float(os.environ.get('VAD_SILENCE_DBFS', -50.0))
+
+    # Transcript cache keyed by upload SHA-256 / YouTube video ID + model size
+    TRANSCRIPT_CACHE_ENABLED = os.environ.get('TRANSCRIPT_CACHE_ENABLED', 'true').lower() == 'true'
+    TRANSCRIPT_CACHE_DIR = os.environ.get('TRANSCRIPT_CACHE_DIR', 'cache/transcripts')
+    TRANSCRIPT_CACHE_MAX_MB = int(os.environ.get('TRANSCRIPT_CACHE_MAX_MB', 200))
+    # Acoustic fingerprint dedup for re-encoded/trimmed uploads (needs the transcript cache)
+    FINGERPRINT_ENABLED = os.environ.get('FINGERPRINT_ENABLED', 'true').lower() == 'true'
+    FINGERPRINT_DIR = os.environ.get('FINGERPRINT_DIR', 'cache/fingerprints')
+    FINGERPRINT_MAX_ENTRIES = int(os.environ.get('FINGERPRINT_MAX_ENTRIES', 500))
+    # Match when at most this fraction of fingerprint bits differ...
+    FINGERPRINT_MAX_BER = float(os.environ.get('FINGERPRINT_MAX_BER', 0.35))
+    # ...and the earlier upload covers at least this fraction of the new one
+    FINGERPRINT_MIN_COVERAGE = float(os.environ.get('FINGERPRINT_MIN_COVERAGE', 0.9))
+
+    # YouTube ingestion: download only the audio stream (set to false to fetch full video)
+    YOUTUBE_AUDIO_ONLY = os.environ.get('YOUTUBE_AUDIO_ONLY', 'true').lower() == 'true'
+    # Use existing YouTube subtitles instead of Whisper when a track is available
+    YOUTUBE_CAPTIONS = os.environ.get('YOUTUBE_CAPTIONS', 'true').lower() == 'true'
+    CAPTION_LANGUAGES = os.environ.get('CAPTION_LANGUAGES', 'en,en-US,en-GB')
+
+    # Cache of post generations keyed by model, prompt, temperature and max_tokens
+    LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+    LLM_CACHE_DIR = os.environ.get('LLM_CACHE_DIR', 'cache/llm')
+    LLM_CACHE_MAX_MB = int(os.environ.get('LLM_CACHE_MAX_MB', 50))
+    LLM_CACHE_TTL_HOURS = int(os.environ.get('LLM_CACHE_TTL_HOURS', 168))
+    # Approximate tokens of transcript in the post prompt
+    PROMPT_TRANSCRIPT_TOKENS = int(os.environ.get('PROMPT_TRANSCRIPT_TOKENS', 750))
+    # Fill that budget with the most salient sentences of the whole transcript instead of its beginning
+    CONDENSE_TRANSCRIPT = os.environ.get('CONDENSE_TRANSCRIPT', 'true').lower() == 'true'
+    # Write LinkedIn, Facebook and Instagram versions of the post in one completion (false = LinkedIn post everywhere)
+    POST_VARIANTS = os.environ.get('POST_VARIANTS', 'true').lower() == 'true'
+    # Stream the post to the job page token by token while it is written
+    STREAM_GENERATION = os.environ.get('STREAM_GENERATION', 'true').lower() == 'true'
+    # Cache of generated post images keyed by prompt, model, size and quality
+    IMAGE_CACHE_ENABLED = os.environ.get('IMAGE_CACHE_ENABLED', 'true').lower() == 'true'
+    IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', 'cache/images')
+    IMAGE_CACHE_MAX_MB = int(os.environ.get('IMAGE_CACHE_MAX_MB', 200))
+    # Receive DALL-E images base64-encoded in the API response instead of downloading them from a URL
+    IMAGE_B64_JSON = os.environ.get('IMAGE_B64_JSON', 'true').lower() == 'true'
+    # Default source of the post image: 'dalle', 'keyframe' (best frame of the video) or 'none'
+    IMAGE_MODE = os.environ.get('IMAGE_MODE', 'dalle')
+    # Scene-change score (0-1) that marks a new keyframe candidate, and how many candidates to score
+    KEYFRAME_SCENE_THRESHOLD = float(os.environ.get('KEYFRAME_SCENE_THRESHOLD', 0.3))
+    KEYFRAME_CANDIDATES = int(os.environ.get('KEYFRAME_CANDIDATES', 12))
+    # Seconds the post waits for its image (started alongside the text); 0 = no limit
+    IMAGE_DEADLINE_SECONDS = float(os.environ.get('IMAGE_DEADLINE_SECONDS', 30))
+    # Start post text and image generation from the leading transcript while the rest is transcribed
+    PIPELINED_GENERATION = os.environ.get('PIPELINED_GENERATION', 'true').lower() == 'true'
+    # With pipelining, the first transcription window is this short so the leading transcript is ready early
+    PIPELINE_LEAD_SECONDS = int(os.environ.get('PIPELINE_LEAD_SECONDS', 60))
+
+    # Background jobs: worker processes that download, transcribe and generate off the web process
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    # Finished jobs and their results are kept this long for the review page
+    JOB_RESULT_TTL_MINUTES = int(os.environ.get('JOB_RESULT_TTL_MINUTES', 60))
+    # Admission control: new jobs get 429 + Retry-After beyond these limits
+    JOB_QUEUE_MAX = int(os.environ.get('JOB_QUEUE_MAX', 20))
+    # Estimated audio still to transcribe across all queued and running jobs
+    JOB_QUEUE_MAX_AUDIO_MINUTES = int(os.environ.get('JOB_QUEUE_MAX_AUDIO_MINUTES', 600))
+    MAX_ACTIVE_JOBS_PER_USER = int(os.environ.get('MAX_ACTIVE_JOBS_PER_USER', 3))
+    # Jobs one user may have running while other users are waiting
+    MAX_RUNNING_JOBS_PER_USER = int(os.environ.get('MAX_RUNNING_JOBS_PER_USER', 1))
+    # Cost estimate when the duration is not known up front (YouTube URLs)
+    DEFAULT_JOB_AUDIO_SECONDS = int(os.environ.get('DEFAULT_JOB_AUDIO_SECONDS', 600))
+
     @classmethod
     def validate_config(cls):
         """Validate that required configuration is present"""
@@ -53,3 +161,9 @@ class Config:
     UPLOAD_FOLDER = 'uploads'
     IMAGES_FOLDER = 'images'
     ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
+
+    MAX_UPLOAD_MB = int(os.environ.get('MAX_UPLOAD_MB', 2048))
+    # Chunk size the browser uses for resumable uploads
+    UPLOAD_CHUNK_MB = int(os.environ.get('UPLOAD_CHUNK_MB', 8))
+    # Unfinished resumable uploads are deleted after this many hours
+    UPLOAD_EXPIRY_HOURS = int(os.environ.get('UPLOAD_EXPIRY_HOURS', 24))
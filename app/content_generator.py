@@ -1,52 +1,171 @@
-from openai import OpenAI
 import os
+import re
+import json
+import time
+import uuid
+import base64
 import requests
 import tempfile
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from app.config import Config
+from app.exceptions import InvalidCompletionException
+from app.openai_client import get_openai_client, call_openai
+from app.llm_cache import cached_chat_completion
+from app.image_cache import image_cache_key, cached_image, store_image
+from app.keyframes import extract_keyframe
+from app.progress import report_stage, post_token_reporter
+from app.condense import condense_transcript, top_sentences, CHARS_PER_TOKEN
+from app.hashtags import suggest_hashtags
 
-def generate_linkedin_post(transcript, video_title=None):
+# Only this much of the transcript reaches the post and image prompts
+POST_TRANSCRIPT_CHARS = Config.PROMPT_TRANSCRIPT_TOKENS * CHARS_PER_TOKEN
+IMAGE_TRANSCRIPT_CHARS = 300
+# Shorter transcripts get no image
+IMAGE_MIN_TRANSCRIPT_CHARS = 200
+# Longest takeaway line in a post written without the API
+FALLBACK_TAKEAWAY_CHARS = 160
+# What each platform accepts: caption length and how many hashtags are kept
+PLATFORM_LIMITS = {
+    'linkedin': {'max_chars': 3000, 'max_hashtags': 7},
+    'facebook': {'max_chars': 2000, 'max_hashtags': 5},
+    'instagram': {'max_chars': 2200, 'max_hashtags': 30},
+}
+PLATFORMS = tuple(PLATFORM_LIMITS)
+# A sentence ends at . ! or ? (plus any closing quote or bracket) followed by whitespace or the end
+_SENTENCE_END = re.compile(r'[.!?]["\')\]]*(?=\s|$)')
+_HASHTAG = re.compile(r'#\w+')
+
+# Post text and image requests run side by side; both mostly wait on the network
+_generation_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='generation')
+
+def generate_linkedin_post(transcript, video_title=None, regenerate=False, generate_image=True):
     """
     Generate LinkedIn post content using OpenAI with proper title, description, and tags
+
+    `regenerate` asks for a fresh post instead of a cached one;
+    `generate_image=False` skips the DALL-E image.
     """
     try:
         if not Config.OPENAI_API_KEY:
             return generate_fallback_content(transcript, video_title)
         
-        # Initialize OpenAI client
-        client = OpenAI(api_key=Config.OPENAI_API_KEY)
-        
-        # Generate LinkedIn post content
-        linkedin_post = generate_linkedin_content(client, transcript, video_title)
-        
-        # Generate image if content is substantial
-        image_path = None
-        if len(transcript) > 200:
-            try:
-                image_path = generate_post_image(client, video_title, transcript[:500])
-                if not image_path or not os.path.exists(image_path):
-                    image_path = None
-            except Exception as img_error:
-                print(f"Image generation failed: {img_error}")
-                image_path = None
-        
-        # Return structured result
-        return {
-            'post': linkedin_post,
-            'content': linkedin_post,
-            'image_url': image_path  # Actually image_path now
-        }
+        # The image prompt does not depend on the post, so both requests go out together
+        text_future = start_post_text(transcript, video_title, regenerate)
+        image_future, image_deadline = None, None
+        if generate_image:
+            image_future, image_deadline = start_post_image(transcript, video_title, regenerate)
+        return collect_generated_post(transcript, video_title, text_future, image_future, image_deadline)
         
     except Exception as e:
         print(f"OpenAI content generation error: {str(e)}")
         return generate_fallback_content(transcript, video_title)
 
-def generate_linkedin_content(client, transcript, video_title):
-    """Generate structured LinkedIn content using OpenAI"""
+def start_post_text(transcript, video_title=None, regenerate=False):
+    """Start generate_post_text() in the background; returns its future"""
+    return _generation_executor.submit(generate_post_text, transcript, video_title, regenerate)
+
+def start_post_image(transcript, video_title=None, regenerate=False):
+    """
+    Start generate_post_image_file() in the background
+
+    Returns (future, deadline): the time.monotonic() after which the post
+    goes out without the image (None = wait for it).
+    """
+    deadline = time.monotonic() + Config.IMAGE_DEADLINE_SECONDS if Config.IMAGE_DEADLINE_SECONDS else None
+    return _generation_executor.submit(generate_post_image_file, transcript, video_title, regenerate), deadline
+
+def start_keyframe_image(video_path):
+    """Start extract_keyframe() into a new post image path in the background; returns its future"""
+    return _generation_executor.submit(extract_keyframe, video_path, new_post_image_path())
+
+def collect_generated_post(transcript, video_title, text_future, image_future=None, image_deadline=None):
+    """
+    Wait for the post text, and for the image until its deadline
+
+    Falls back to generate_fallback_content() if the text failed. An image
+    that misses its deadline is dropped and deleted once it arrives.
+    """
+    try:
+        variants = text_future.result()
+    except Exception as e:
+        print(f"OpenAI content generation error: {str(e)}")
+        if image_future is not None:
+            discard_image_future(image_future)
+        return generate_fallback_content(transcript, video_title)
+    
+    image_path = None
+    if image_future is not None:
+        timeout = max(0.0, image_deadline - time.monotonic()) if image_deadline is not None else None
+        try:
+            image_path = image_future.result(timeout=timeout)
+        except FutureTimeoutError:
+            print(f"⏱️ Image not ready within {Config.IMAGE_DEADLINE_SECONDS}s, posting without it")
+            discard_image_future(image_future)
+    
+    # Return structured result
+    return {
+        'post': variants['linkedin'],
+        'content': variants['linkedin'],
+        'variants': variants,
+        'image_url': image_path  # Actually image_path now
+    }
+
+def discard_image_future(image_future):
+    """Delete the image of an unused generation whenever it finishes"""
+    def remove_image(future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        image_path = future.result()
+        if image_path and os.path.exists(image_path):
+            os.remove(image_path)
+    image_future.add_done_callback(remove_image)
+
+def generate_post_text(transcript, video_title=None, regenerate=False):
+    """Post text for each platform, {platform: text}; raises on API errors"""
+    client = get_openai_client()
+    report_stage('generate')
+    on_token = post_token_reporter() if Config.STREAM_GENERATION else None
+    if Config.POST_VARIANTS:
+        try:
+            variants = generate_post_variants(client, transcript, video_title, regenerate, on_token)
+        except InvalidCompletionException as e:
+            print(f"⚠️ Post variants reply unusable ({e.message}), writing one post for every platform")
+            on_token = post_token_reporter() if Config.STREAM_GENERATION else None
+            variants = platform_variants(generate_linkedin_content(client, transcript, video_title, regenerate, on_token))
+    else:
+        variants = platform_variants(generate_linkedin_content(client, transcript, video_title, regenerate, on_token))
+    report_stage('generate', 100)
+    return variants
+
+def generate_post_image_file(transcript, video_title=None, regenerate=False):
+    """Local path of a generated post image, or None if the transcript is too short or generation fails"""
+    if len(transcript) <= IMAGE_MIN_TRANSCRIPT_CHARS:
+        return None
+    try:
+        client = get_openai_client()
+        report_stage('image')
+        image_path = generate_post_image(client, video_title, transcript[:500], regenerate)
+        if not image_path or not os.path.exists(image_path):
+            return None
+        return image_path
+    except Exception as img_error:
+        print(f"Image generation failed: {img_error}")
+        return None
+
+def prompt_transcript(transcript):
+    """The transcript as it appears in the post prompt: condensed, or cut to POST_TRANSCRIPT_CHARS"""
+    if Config.CONDENSE_TRANSCRIPT:
+        return condense_transcript(transcript, Config.PROMPT_TRANSCRIPT_TOKENS)
+    return transcript[:POST_TRANSCRIPT_CHARS]
+
+def generate_linkedin_content(client, transcript, video_title, regenerate=False, on_token=None):
+    """Generate structured LinkedIn content using OpenAI (cached by prompt unless `regenerate`; streamed to `on_token`)"""
     
     prompt = f"""Analyze this video transcript and create a professional LinkedIn post:
 
 VIDEO TITLE: {video_title or "Video Content"}
-TRANSCRIPT: {transcript[:3000]}
+TRANSCRIPT: {prompt_transcript(transcript)}
 
 Create a natural LinkedIn post that:
 - Starts with an engaging hook related to the actual video content
@@ -60,33 +179,129 @@ Create a natural LinkedIn post that:
 
 Write as if you watched the video and are sharing genuine insights with your professional network."""
 
-    response = client.chat.completions.create(
+    content = cached_chat_completion(
+        client,
         model="gpt-3.5-turbo",
         messages=[
             {"role": "system", "content": "You are a professional creating LinkedIn content. Write natural, engaging posts based on video content. Never mention AI or automation. Focus on genuine insights from the transcript."},
             {"role": "user", "content": prompt}
         ],
         max_tokens=500,
-        temperature=0.7
+        temperature=0.7,
+        timeout=Config.OPENAI_TIMEOUT_SECONDS,
+        regenerate=regenerate,
+        on_token=on_token,
+        truncated=trim_to_sentence
     )
     
     # Just return the raw content
-    return response.choices[0].message.content.strip()
+    return content.strip()
 
-def generate_post_image(client, title, transcript_sample):
-    """Generate and save image locally"""
+def trim_to_sentence(text):
+    """A post cut off at max_tokens, trimmed back to its last complete sentence"""
+    ends = list(_SENTENCE_END.finditer(text))
+    if not ends:
+        raise InvalidCompletionException("Post was cut off before its first sentence ended")
+    print("⚠️ Post was cut off at max_tokens, keeping it up to its last complete sentence")
+    return text[:ends[-1].end()].rstrip()
+
+def generate_post_variants(client, transcript, video_title, regenerate=False, on_token=None):
+    """LinkedIn, Facebook and Instagram versions of the post from a single JSON chat completion"""
+    
+    prompt = f"""Analyze this video transcript and write a post about it for each of LinkedIn, Facebook and Instagram:
+
+VIDEO TITLE: {video_title or "Video Content"}
+TRANSCRIPT: {prompt_transcript(transcript)}
+
+Reply with a JSON object with exactly these keys:
+- "linkedin": a professional long-form post (800-1300 characters). Start with an engaging hook, summarize the key insights in 3-4 bullet points, end with an engaging question and 5-7 relevant hashtags.
+- "facebook": a conversational caption of 2-4 short sentences (under 500 characters) with at most 3 hashtags.
+- "instagram": a punchy caption with line breaks and a few emojis (under 2000 characters), followed by 10-15 relevant hashtags.
+
+Every version must:
+- Be based on the actual video content and insights (not generic tech content)
+- Sound natural and human-written
+- NEVER mention AI, automation, or generated content
+
+Write as if you watched the video and are sharing genuine insights."""
+
+    content = cached_chat_completion(
+        client,
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": "You are a social media professional writing posts based on video content. Never mention AI or automation. Focus on genuine insights from the transcript. Reply in JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=1200,
+        temperature=0.7,
+        timeout=Config.OPENAI_TIMEOUT_SECONDS,
+        regenerate=regenerate,
+        response_format={"type": "json_object"},
+        on_token=on_token,
+        validate=parse_post_variants
+    )
+    return parse_post_variants(content)
+
+def parse_post_variants(content):
+    """
+    {platform: text} from the model's JSON reply, fitted to PLATFORM_LIMITS
+
+    A platform missing from the reply gets the LinkedIn text. Raises
+    InvalidCompletionException if the reply is not a JSON object with at
+    least one post in it.
+    """
+    try:
+        data = json.loads(content)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        raise InvalidCompletionException("Post variants reply was not a JSON object")
+    
+    linkedin_post = data.get('linkedin')
+    if not isinstance(linkedin_post, str) or not linkedin_post.strip():
+        linkedin_post = next((text for text in data.values() if isinstance(text, str) and text.strip()), None)
+    if linkedin_post is None:
+        raise InvalidCompletionException("Post variants reply had no post text")
+    variants = {}
+    for platform in PLATFORMS:
+        text = data.get(platform)
+        if not isinstance(text, str) or not text.strip():
+            text = linkedin_post
+        variants[platform] = fit_to_platform(text.strip(), platform)
+    return variants
+
+def platform_variants(post):
+    """The same post for every platform, each fitted to its limits"""
+    return {platform: fit_to_platform(post, platform) for platform in PLATFORMS}
+
+def fit_to_platform(text, platform):
+    """Drop hashtags past the platform's limit and cut the text to its maximum length"""
+    limits = PLATFORM_LIMITS[platform]
+    kept = 0
+    
+    def keep_hashtag(match):
+        nonlocal kept
+        kept += 1
+        return match.group(0) if kept <= limits['max_hashtags'] else ''
+    
+    if len(_HASHTAG.findall(text)) > limits['max_hashtags']:
+        text = _HASHTAG.sub(keep_hashtag, text)
+        text = re.sub(r'[ \t]{2,}', ' ', text).strip()
+    
+    if len(text) > limits['max_chars']:
+        cut = text[:limits['max_chars'] - 1]
+        text = (cut.rsplit(None, 1)[0] if ' ' in cut else cut) + '…'
+    return text
+
+def generate_post_image(client, title, transcript_sample, regenerate=False):
+    """Generate and save image locally (reusing the image cached for an identical prompt unless `regenerate`)"""
     import os
     import requests
-    from datetime import datetime
-    
-    # Create images directory
-    images_dir = Config.IMAGES_FOLDER
-    os.makedirs(images_dir, exist_ok=True)
     
     # Create image prompt based on actual content
     image_prompt = f"""Professional business illustration about: {title}
     
-Based on this content: {transcript_sample[:300]}
+Based on this content: {transcript_sample[:IMAGE_TRANSCRIPT_CHARS]}
 
 Style: Clean, modern, professional business illustration
 Colors: Professional blue, white, light gray gradient
@@ -98,87 +313,81 @@ No platform-specific branding or logos"""
     
     print(f"🎨 Image prompt: {image_prompt[:150]}...")
     
+    image_params = {'model': "dall-e-3", 'size': "1024x1024", 'quality': "standard"}
+    cache_key = image_cache_key(image_prompt, **image_params)
+    
     try:
-        response = client.images.generate(
-            model="dall-e-3",
-            prompt=image_prompt,
-            size="1024x1024",
-            quality="standard",
-            n=1,
-        )
-        
-        image_url = response.data[0].url
-        
-        # Download and save image locally
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"linkedin_post_{timestamp}.png"
-        local_path = os.path.join(images_dir, filename)
-        
-        print(f"📥 Downloading image from DALL-E to: {local_path}")
-        
-        img_response = requests.get(image_url, stream=True)
-        if img_response.status_code == 200:
-            with open(local_path, 'wb') as f:
-                for chunk in img_response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            
-            # Verify file was created
-            if os.path.exists(local_path) and os.path.getsize(local_path) > 0:
-                return local_path
-            else:
-                print(f"Failed to create image file: {local_path}")
-                return None
+        image_data = None if regenerate else cached_image(cache_key)
+        if image_data:
+            print("✅ Image cache hit")
         else:
-            print(f"❌ Failed to download image: HTTP {img_response.status_code}")
-            return None
+            image_data = request_post_image(client, image_prompt, image_params)
+            if not image_data:
+                return None
+            store_image(cache_key, image_data)
+        
+        # Each post gets its own copy, so deleting or editing it never touches the cache
+        local_path = new_post_image_path()
+        with open(local_path, 'wb') as f:
+            f.write(image_data)
+        return local_path
     except Exception as e:
         print(f"DALL-E error: {str(e)}")
         raise e
 
 
-def generate_fallback_content(transcript, video_title):
-    """Fallback content when OpenAI is not available - create content based on actual transcript"""
-    
-    # Extract some key words from transcript for better content
-    words = transcript.lower().split()
-    common_topics = {
-        'business': ['business', 'company', 'revenue', 'profit', 'strategy', 'market'],
-        'technology': ['tech', 'software', 'app', 'digital', 'system', 'platform'],
-        'lifestyle': ['life', 'tips', 'hack', 'easy', 'simple', 'quick'],
-        'education': ['learn', 'teaching', 'education', 'training', 'skill'],
-        'health': ['health', 'fitness', 'wellness', 'exercise', 'body']
-    }
+def new_post_image_path():
+    """A fresh, unique path in IMAGES_FOLDER for a post's image"""
+    os.makedirs(Config.IMAGES_FOLDER, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(Config.IMAGES_FOLDER, f"linkedin_post_{timestamp}_{uuid.uuid4().hex[:8]}.png")
+
+def request_post_image(client, image_prompt, image_params):
+    """
+    PNG bytes of a new DALL-E image, or None if it could not be downloaded
+
+    With IMAGE_B64_JSON the image comes back inside the API response,
+    saving the second request to the image URL.
+    """
+    response_format = "b64_json" if Config.IMAGE_B64_JSON else "url"
+    response = call_openai(
+        client.images.generate,
+        prompt=image_prompt,
+        n=1,
+        response_format=response_format,
+        timeout=Config.OPENAI_IMAGE_TIMEOUT_SECONDS,
+        **image_params
+    )
     
-    detected_topics = []
-    for topic, keywords in common_topics.items():
-        if any(keyword in words for keyword in keywords):
-            detected_topics.append(topic)
-    
-    # Create hashtags based on detected topics
-    hashtag_map = {
-        'business': '#Business #Entrepreneurship #Strategy #Leadership',
-        'technology': '#Technology #Innovation #DigitalTransformation #Tech',
-        'lifestyle': '#Lifestyle #Tips #LifeHacks #Productivity',
-        'education': '#Learning #Education #Skills #Development',
-        'health': '#Health #Wellness #Fitness #Lifestyle'
-    }
+    if response_format == "b64_json":
+        return base64.b64decode(response.data[0].b64_json)
     
-    hashtags = []
-    for topic in detected_topics[:2]:  # Max 2 topic groups
-        hashtags.extend(hashtag_map.get(topic, '').split())
+    image_url = response.data[0].url
+    print("📥 Downloading image from DALL-E")
+    img_response = requests.get(image_url, timeout=Config.OPENAI_TIMEOUT_SECONDS)
+    if img_response.status_code != 200 or not img_response.content:
+        print(f"❌ Failed to download image: HTTP {img_response.status_code}")
+        return None
+    return img_response.content
+
+
+def generate_fallback_content(transcript, video_title):
+    """Fallback content when OpenAI is not available - create content based on actual transcript"""
     
-    if not hashtags:
-        hashtags = ['#Insights', '#Professional', '#Learning', '#Growth']
+    # Hashtags from the offline topic/IDF index in app/data, no network needed
+    hashtags_str = ' '.join(suggest_hashtags(transcript, k=6))  # Max 6 hashtags
     
-    hashtags_str = ' '.join(hashtags[:6])  # Max 6 hashtags
+    # The transcript's most central sentences make the takeaways
+    takeaways = top_sentences(transcript, 3, max_chars=FALLBACK_TAKEAWAY_CHARS)
+    if len(takeaways) < 3:
+        takeaways += ['Practical applications worth considering', 'Valuable perspective on the topic',
+                      'Ideas worth discussing with your team'][:3 - len(takeaways)]
+    takeaways_str = '\n'.join(f"• {takeaway}" for takeaway in takeaways)
     
     post_content = f"""Interesting insights from: "{video_title or 'Recent Analysis'}"
 
 Key takeaways that caught my attention:
-• {transcript[:100].strip()}...
-• Practical applications worth considering
-• Valuable perspective on the topic
+{takeaways_str}
 
 The discussion brings up important points that many professionals can relate to.
 
@@ -189,5 +398,6 @@ What's your experience with this topic?
     return {
         'post': post_content,
         'content': post_content,
+        'variants': platform_variants(post_content),
         'image_url': None
     }
@@ -0,0 +1,152 @@
+"""Size-bounded on-disk LRU cache shared by the transcript, LLM and image caches"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class DiskCache:
+    """
+    Key/value store with one file per entry under `directory`
+
+    Reads refresh an entry's mtime, and writes evict the least recently used
+    entries until the directory fits in `max_bytes`. Entries older than
+    `ttl_seconds` (when set) are treated as misses and removed.
+    The web process and the job workers share the directory; the lock only
+    covers threads, so entries removed by another process are skipped.
+    """
+
+    def __init__(self, directory, max_bytes, ttl_seconds=None, suffix='.json'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + self.suffix)
+
+    def _expired(self, path):
+        return self.ttl_seconds is not None and time.time() - os.path.getmtime(path) > self.ttl_seconds
+
+    def get_bytes(self, key, count=True):
+        """Stored bytes for `key`, or None; `count=False` leaves the hit/miss counters alone"""
+        path = self.path_for(key)
+        with self._lock:
+            try:
+                if self._expired(path):
+                    os.remove(path)
+                    raise FileNotFoundError(path)
+                with open(path, 'rb') as f:
+                    data = f.read()
+                # Touch on read so eviction follows recency of use, not of creation.
+                # With a TTL the mtime is the creation time, so leave it alone.
+                if self.ttl_seconds is None:
+                    os.utime(path)
+            except FileNotFoundError:
+                if count:
+                    self.misses += 1
+                return None
+            if count:
+                self.hits += 1
+            return data
+
+    def record_lookup(self, hit):
+        """Count one lookup made of several uncounted probes"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def set_bytes(self, key, data):
+        path = self.path_for(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        with self._lock:
+            os.replace(tmp_path, path)
+            self._evict()
+        return path
+
+    def get_json(self, key, count=True):
+        data = self.get_bytes(key, count)
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            self.delete(key)
+            return None
+
+    def set_json(self, key, value):
+        return self.set_bytes(key, json.dumps(value).encode('utf-8'))
+
+    def delete(self, key):
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self.suffix):
+                # Other processes share the directory and may evict or replace an entry at any time
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def counters(self):
+        """This process's hit, miss and eviction counts"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def stats(self, other_counters=()):
+        """
+        Size and effectiveness of the cache
+
+        Counters live in each process; pass the counters() of the same cache
+        in other processes (e.g. the job workers) to include their lookups.
+        """
+        totals = self.counters()
+        for counters in other_counters:
+            for name in totals:
+                totals[name] += counters.get(name, 0)
+        with self._lock:
+            entries = self._entries()
+        lookups = totals['hits'] + totals['misses']
+        return {
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'hits': totals['hits'],
+            'misses': totals['misses'],
+            'hit_rate': round(totals['hits'] / lookups, 3) if lookups else None,
+            'evictions': totals['evictions'],
+        }
@@ -6,3 +6,29 @@ class TokenExpiredException(Exception):
         self.platform = platform
         self.message = message or f"{platform} access token has expired or been revoked"
         super().__init__(self.message)
+
+class UploadException(Exception):
+    """Raised when an upload request is invalid; carries the HTTP status to answer with"""
+    def __init__(self, message, status_code=400):
+        self.message = message
+        self.status_code = status_code
+        super().__init__(self.message)
+
+class UploadTooLargeException(UploadException):
+    """Raised as soon as an upload is known to exceed the size limit"""
+    def __init__(self, limit_bytes, message=None):
+        self.limit_bytes = limit_bytes
+        super().__init__(message or f"Upload exceeds the {limit_bytes // (1024 * 1024)} MB limit", 413)
+
+class QueueFullException(Exception):
+    """Raised when a job is refused because the system or the user is at capacity"""
+    def __init__(self, message, retry_after):
+        self.message = message
+        self.retry_after = retry_after  # Seconds until capacity is likely to be available
+        super().__init__(self.message)
+
+class InvalidCompletionException(Exception):
+    """Raised when a chat completion cannot be used, e.g. cut off at max_tokens or not the requested JSON"""
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
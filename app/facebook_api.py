@@ -3,6 +3,7 @@ import requests
 import time
 from app.config import Config
 from app.exceptions import TokenExpiredException
+from app.renditions import platform_image
 
 def get_facebook_authorization_url():
     """Generate Facebook OAuth authorization URL"""
@@ -98,6 +99,7 @@ def post_to_facebook(access_token, text, image_path=None):
     
     if image_path:
         # Post with image
+        image_path = platform_image(image_path, 'facebook')
         print(f"📤 Posting to Facebook Page '{page_name}' with image...")
         with open(image_path, 'rb') as image_file:
             files = {'source': image_file}
@@ -0,0 +1,265 @@
+"""Acoustic fingerprints for spotting re-encoded or trimmed copies of earlier uploads"""
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import numpy as np
+from app.config import Config
+from app.audio import stream_audio
+
+# Haitsma/Kalker-style sub-fingerprints: 32 bits per frame from the sign of
+# energy differences between 33 log-spaced bands, across frequency and time.
+FP_SAMPLE_RATE = 5000
+FP_FRAME = 2048
+FP_HOP = 256
+FP_BANDS = 33
+FP_MIN_HZ = 300
+FP_MAX_HZ = 2000
+FP_BLOCK_FRAMES = 2048
+# Seconds of 5 kHz audio read from the ffmpeg pipe at a time
+FP_STREAM_SECONDS = 30
+# Offset votes needed before a candidate alignment is verified bit by bit
+MIN_OFFSET_VOTES = 5
+
+_BAND_EDGES = np.geomspace(FP_MIN_HZ, FP_MAX_HZ, FP_BANDS + 1)
+_BAND_BINS = np.round(_BAND_EDGES * FP_FRAME / FP_SAMPLE_RATE).astype(int)
+_WINDOW = np.hanning(FP_FRAME).astype(np.float32)
+_BIT_WEIGHTS = (1 << np.arange(31, -1, -1, dtype=np.uint64)).astype(np.uint64)
+
+
+def frames_to_seconds(frames):
+    return frames * FP_HOP / FP_SAMPLE_RATE
+
+
+def _band_energies(audio):
+    n_frames = 1 + (len(audio) - FP_FRAME) // FP_HOP
+    frames = np.lib.stride_tricks.as_strided(
+        audio, shape=(n_frames, FP_FRAME), strides=(audio.strides[0] * FP_HOP, audio.strides[0]),
+        writeable=False,
+    )
+    energies = np.empty((n_frames, FP_BANDS), dtype=np.float32)
+    # Blocks keep the FFT working set to a few MB however long the recording is
+    for start in range(0, n_frames, FP_BLOCK_FRAMES):
+        block = frames[start:start + FP_BLOCK_FRAMES] * _WINDOW
+        power = np.abs(np.fft.rfft(block, axis=1)) ** 2
+        energies[start:start + len(block)] = np.add.reduceat(power, _BAND_BINS, axis=1)[:, :FP_BANDS]
+    return energies
+
+
+def compute_fingerprint(file_path):
+    """
+    uint32 sub-fingerprint per ~51 ms frame, from a cheap 5 kHz mono decode
+
+    The audio is read from an ffmpeg pipe FP_STREAM_SECONDS at a time, so
+    memory stays flat however long the upload is. Samples after the last
+    whole frame of a window carry over into the next one, and so does the
+    last frame's band differences, which the next frame's bits compare
+    against; the result equals fingerprinting the whole decode at once.
+    """
+    pieces = []
+    carry = np.zeros(0, dtype=np.float32)
+    previous_diff = None
+    total_samples = 0
+    for window in stream_audio(file_path, FP_STREAM_SECONDS, sample_rate=FP_SAMPLE_RATE):
+        total_samples += len(window)
+        audio = np.concatenate([carry, window])
+        if len(audio) < FP_FRAME:
+            carry = audio
+            continue
+        energies = _band_energies(audio)
+        carry = audio[len(energies) * FP_HOP:].copy()
+        band_diff = energies[:, :-1] - energies[:, 1:]
+        if previous_diff is not None:
+            band_diff = np.vstack([previous_diff, band_diff])
+        if len(band_diff) > 1:
+            bits = (band_diff[1:] - band_diff[:-1]) > 0
+            pieces.append((bits.astype(np.uint64) @ _BIT_WEIGHTS).astype(np.uint32))
+        previous_diff = band_diff[-1:]
+
+    if total_samples < FP_FRAME * 2 or not pieces:
+        return np.zeros(0, dtype=np.uint32)
+    return np.concatenate(pieces)
+
+
+def _best_offset(query, candidate):
+    """Most-voted alignment (candidate frame - query frame) from exactly matching sub-fingerprints"""
+    order = np.argsort(candidate, kind='stable')
+    sorted_candidate = candidate[order]
+    left = np.searchsorted(sorted_candidate, query, 'left')
+    right = np.searchsorted(sorted_candidate, query, 'right')
+    # Only values that occur once in the candidate vote; silence repeats the same value everywhere
+    unique = (right - left) == 1
+    if not unique.any():
+        return None, 0
+    offsets = order[left[unique]] - np.nonzero(unique)[0]
+    shifted = offsets + len(query)
+    votes = np.bincount(shifted)
+    best = int(np.argmax(votes))
+    return best - len(query), int(votes[best])
+
+
+def _bit_error_rate(query, candidate, offset):
+    """Fraction of differing bits where query frame i aligns with candidate frame i + offset"""
+    q_start = max(0, -offset)
+    c_start = max(0, offset)
+    overlap = min(len(query) - q_start, len(candidate) - c_start)
+    if overlap <= 0:
+        return 1.0, 0
+    diff = np.bitwise_xor(query[q_start:q_start + overlap], candidate[c_start:c_start + overlap])
+    errors = np.unpackbits(diff.view(np.uint8)).sum()
+    return float(errors) / (overlap * 32), overlap
+
+
+class FingerprintIndex:
+    """
+    Fingerprints of earlier uploads, each pointing at its cached transcript
+
+    Stored as one .npy file per upload plus a JSON manifest in `directory`.
+    The oldest entries are dropped once more than `max_entries` exist.
+    Manifest updates hold a lock file, so job worker processes adding
+    entries at the same time do not overwrite each other's.
+    """
+
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.manifest_path = os.path.join(directory, 'index.json')
+        self._lock = threading.Lock()
+        self._loaded = {}  # entry id -> fingerprint array
+        os.makedirs(directory, exist_ok=True)
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    @contextmanager
+    def _manifest_lock(self):
+        with open(os.path.join(self.directory, 'index.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _fingerprint(self, entry_id):
+        if entry_id not in self._loaded:
+            self._loaded[entry_id] = np.load(os.path.join(self.directory, f"{entry_id}.npy"))
+        return self._loaded[entry_id]
+
+    def add(self, fingerprint, transcript_key, variant):
+        with self._lock, self._manifest_lock():
+            entry_id = uuid.uuid4().hex
+            np.save(os.path.join(self.directory, f"{entry_id}.npy"), fingerprint)
+            manifest = self._read_manifest()
+            manifest[entry_id] = {
+                'transcript_key': transcript_key,
+                'variant': variant,
+                'frames': int(len(fingerprint)),
+                'created': time.time(),
+            }
+            for old_id, _ in sorted(manifest.items(), key=lambda item: item[1]['created'])[:-self.max_entries]:
+                manifest.pop(old_id)
+                self._loaded.pop(old_id, None)
+                try:
+                    os.remove(os.path.join(self.directory, f"{old_id}.npy"))
+                except FileNotFoundError:
+                    pass
+            self._write_manifest(manifest)
+            return entry_id
+
+    def find_match(self, fingerprint, variant, max_ber=None, min_coverage=None):
+        """
+        Compare `fingerprint` against every stored upload with the same variant
+
+        Always returns a decision dict describing the best candidate found,
+        with `matched` set when it passes both the bit-error-rate and the
+        coverage threshold.
+        """
+        max_ber = Config.FINGERPRINT_MAX_BER if max_ber is None else max_ber
+        min_coverage = Config.FINGERPRINT_MIN_COVERAGE if min_coverage is None else min_coverage
+        decision = {
+            'matched': False,
+            'candidates': 0,
+            'max_ber': max_ber,
+            'min_coverage': min_coverage,
+        }
+        if len(fingerprint) == 0:
+            return decision
+
+        with self._lock:
+            manifest = self._read_manifest()
+            best = None
+            for entry_id, entry in manifest.items():
+                if entry.get('variant') != variant:
+                    continue
+                try:
+                    stored = self._fingerprint(entry_id)
+                except (FileNotFoundError, ValueError):
+                    continue
+                decision['candidates'] += 1
+
+                offset, votes = _best_offset(fingerprint, stored)
+                if offset is None or votes < MIN_OFFSET_VOTES:
+                    continue
+                ber, overlap = _bit_error_rate(fingerprint, stored, offset)
+                if best is None or ber < best['ber']:
+                    best = {
+                        'entry_id': entry_id,
+                        'transcript_key': entry['transcript_key'],
+                        'ber': round(ber, 4),
+                        'coverage': round(overlap / len(fingerprint), 4),
+                        'offset_seconds': round(frames_to_seconds(offset), 3),
+                        'votes': votes,
+                    }
+
+        if best:
+            decision.update(best)
+            decision['matched'] = best['ber'] <= max_ber and best['coverage'] >= min_coverage
+        return decision
+
+
+_index = None
+
+
+def get_fingerprint_index():
+    global _index
+    if _index is None:
+        _index = FingerprintIndex(Config.FINGERPRINT_DIR, Config.FINGERPRINT_MAX_ENTRIES)
+    return _index
+
+
+def align_transcript(transcript, offset_seconds, duration_seconds):
+    """
+    Shift a stored transcript onto a new upload's timeline
+
+    `offset_seconds` is where the new upload starts within the stored one;
+    segments outside the new upload's span are dropped.
+    """
+    end_seconds = offset_seconds + duration_seconds
+    segments = []
+    for segment in transcript.get('segments', []):
+        if segment['end'] <= offset_seconds or segment['start'] >= end_seconds:
+            continue
+        segments.append({
+            'start': max(0.0, segment['start'] - offset_seconds),
+            'end': segment['end'] - offset_seconds,
+            'text': segment['text'],
+        })
+
+    aligned = dict(transcript)
+    aligned['segments'] = segments
+    if transcript.get('segments'):
+        aligned['text'] = ''.join(segment['text'] for segment in segments)
+    return aligned
@@ -0,0 +1,127 @@
+"""Offline keyword scoring and hashtag suggestions, for posts written without the OpenAI API"""
+import itertools
+import json
+import os
+import re
+from collections import Counter
+import numpy as np
+from app.condense import STOPWORDS
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), 'data', 'hashtags.json')
+# Terms this common (IDF at or below) say nothing about what a video is about
+MIN_KEYWORD_IDF = 2.0
+# Transcript terms only become hashtags of their own when they come up this often
+MIN_KEYWORD_COUNT = 2
+MAX_KEYWORD_HASHTAGS = 2
+DEFAULT_HASHTAGS = ['#Insights', '#Professional', '#Learning', '#Growth']
+# Inflections tried, longest first, when a term is not in the IDF table itself
+SUFFIXES = ('ing', 'ies', 'es', 'ed', 's')
+
+_WORD = re.compile(r"[a-z][a-z0-9']+")
+_index = None
+
+
+def _load_index():
+    """IDF table and the topic x keyword matrix, read from DATA_FILE once per process"""
+    global _index
+    if _index is None:
+        with open(DATA_FILE, encoding='utf-8') as f:
+            data = json.load(f)
+        idf = {word: float(value) for value, words in data['idf_bands'].items() for word in words.split()}
+        topics = data['topics']
+        keywords = sorted({keyword for topic in topics.values() for keyword in topic['keywords']})
+        columns = {keyword: column for column, keyword in enumerate(keywords)}
+        membership = np.zeros((len(topics), len(keywords)), dtype=np.float32)
+        for row, topic in enumerate(topics.values()):
+            for keyword in topic['keywords']:
+                membership[row, columns[keyword]] = 1
+        # Topics with long keyword lists should not win just by having more words to match
+        membership /= np.sqrt(membership.sum(axis=1, keepdims=True))
+        _index = {
+            'idf': idf,
+            'default_idf': float(data['default_idf']),
+            'hashtags': [topic['hashtags'] for topic in topics.values()],
+            'columns': columns,
+            # Every word the scores know, so inflected forms can be reduced to one of them
+            'vocabulary': frozenset(idf) | frozenset(columns),
+            'membership': membership,
+        }
+    return _index
+
+
+def _base_form(word, vocabulary):
+    """`word` as listed in the IDF table or a topic, with a plural or -ing/-ed ending removed if that finds it"""
+    if word in vocabulary:
+        return word
+    for suffix in SUFFIXES:
+        stem = word[:-len(suffix)]
+        if word.endswith(suffix) and len(stem) >= 3:
+            for base in (stem, stem + 'e', stem + 'y', stem[:-1] if stem[-1:] == stem[-2:-1] else None):
+                if base in vocabulary:
+                    return base
+    return word
+
+
+def keyword_scores(text):
+    """(term, count, tf-idf weight) for every term in `text`, highest weight first"""
+    index = _load_index()
+    # Contractions ("we're", "that's") and stopwords never name a topic
+    counts = Counter(
+        _base_form(word, index['vocabulary']) for word in _WORD.findall(text.lower())
+        if "'" not in word and word not in STOPWORDS
+    )
+    if not counts:
+        return []
+    terms = list(counts)
+    tf = np.fromiter(counts.values(), dtype=np.float32, count=len(terms))
+    idf = np.fromiter((index['idf'].get(term, index['default_idf']) for term in terms),
+                      dtype=np.float32, count=len(terms))
+    weights = (1 + np.log(tf)) * idf
+    return [(terms[i], int(tf[i]), float(weights[i])) for i in np.argsort(-weights, kind='stable')]
+
+
+def topic_scores(scored_terms):
+    """Relevance of each topic in DATA_FILE to the scored terms, in file order"""
+    index = _load_index()
+    keyword_weights = np.zeros(len(index['columns']), dtype=np.float32)
+    for term, _, weight in scored_terms:
+        column = index['columns'].get(term)
+        if column is not None:
+            keyword_weights[column] = weight
+    return index['membership'] @ keyword_weights
+
+
+def suggest_hashtags(text, k=6):
+    """
+    Up to `k` hashtags for `text`
+
+    The two best-matching topics contribute their main hashtags, the
+    transcript's most distinctive repeated terms add specific ones, and the
+    remaining slots go to further topic hashtags.
+    """
+    index = _load_index()
+    scored_terms = keyword_scores(text)
+    scores = topic_scores(scored_terms)
+    ranked_topics = [row for row in np.argsort(-scores, kind='stable') if scores[row] > 0]
+
+    candidates = []
+    for row in ranked_topics[:2]:
+        candidates.extend(index['hashtags'][row][:2])
+    candidates.extend(itertools.islice((
+        '#' + term.capitalize()
+        for term, count, _ in scored_terms
+        if count >= MIN_KEYWORD_COUNT and len(term) >= 4
+        and index['idf'].get(term, index['default_idf']) > MIN_KEYWORD_IDF
+    ), MAX_KEYWORD_HASHTAGS))
+    for row in ranked_topics:
+        candidates.extend(index['hashtags'][row][2:])
+
+    hashtags = []
+    seen = set()
+    for tag in candidates:
+        # #Startup and #Startups are the same tag
+        key = tag.lower().rstrip('s')
+        if key not in seen:
+            seen.add(key)
+            hashtags.append(tag)
+    return hashtags[:k] if hashtags else DEFAULT_HASHTAGS[:k]
@@ -0,0 +1,34 @@
+"""Cache of generated post images keyed by prompt and generation parameters"""
+import json
+from app.config import Config
+from app.disk_cache import DiskCache
+
+_cache = None
+
+
+def get_image_cache():
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(Config.IMAGE_CACHE_DIR, Config.IMAGE_CACHE_MAX_MB * 1024 * 1024, suffix='.png')
+    return _cache
+
+
+def image_cache_key(prompt, **params):
+    """The prompt with whitespace normalised, plus model/size/quality, as one canonical string"""
+    return json.dumps(dict(params, prompt=' '.join(prompt.split())), sort_keys=True, separators=(',', ':'))
+
+
+def cached_image(key):
+    """PNG bytes stored for `key`, or None"""
+    if not Config.IMAGE_CACHE_ENABLED:
+        return None
+    return get_image_cache().get_bytes(key)
+
+
+def store_image(key, data):
+    if Config.IMAGE_CACHE_ENABLED:
+        get_image_cache().set_bytes(key, data)
+
+
+def image_cache_stats(other_counters=()):
+    return get_image_cache().stats(other_counters)
@@ -3,6 +3,7 @@ import requests
 import time
 from app.config import Config
 from app.exceptions import TokenExpiredException
+from app.renditions import platform_image
 
 def get_instagram_authorization_url():
     """Generate Instagram/Facebook OAuth authorization URL"""
@@ -132,7 +133,7 @@ def post_to_instagram(access_token, text, image_path=None):
     
     # Upload image to get public URL
     print(f"📤 Uploading image to Facebook...")
-    image_url = upload_image_to_facebook(page_id, page_access_token, image_path)
+    image_url = upload_image_to_facebook(page_id, page_access_token, platform_image(image_path, 'instagram'))
     print(f"✅ Image uploaded: {image_url[:50]}...")
     
     # Create Instagram Media Container
@@ -0,0 +1,411 @@
+"""Background job queue: video processing runs on worker processes, off the web event loop"""
+import multiprocessing
+import os
+import threading
+import time
+import math
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from app.config import Config
+from app.exceptions import QueueFullException
+
+JOB_STATES = ('queued', 'running', 'done', 'failed')
+ACTIVE_STATES = ('queued', 'running')
+# Wall-clock seconds per second of audio assumed until a job has finished
+INITIAL_SECONDS_PER_AUDIO_SECOND = 0.5
+# Weight of the newest finished job in the processing rate average
+RATE_SMOOTHING = 0.2
+MIN_RETRY_AFTER_SECONDS = 5
+
+# Web process side
+_jobs = {}                 # job id -> job record
+# Re-entrant: a done callback can run inside pool.submit() while the scheduler holds it
+_jobs_lock = threading.RLock()
+_waiting = []              # ids of admitted jobs not yet handed to a worker
+_dispatched = set()        # ids of jobs handed to a worker and not finished
+_seconds_per_audio_second = INITIAL_SECONDS_PER_AUDIO_SECOND
+_pool = None
+_pool_lock = threading.Lock()
+_events = None             # worker -> web process event queue
+_worker_model_stats = {}   # worker pid -> get_model_stats() of that worker
+_worker_cache_counters = {}  # worker pid -> {cache name: DiskCache.counters()} of that worker
+
+# Worker process side
+_worker_events = None
+_current_job_id = None
+
+
+def _init_worker(events, threads):
+    """Give the worker its event queue, split the CPU between workers and load models"""
+    global _worker_events
+    from app.whisper_models import preload_models, use_thread_share
+
+    _worker_events = events
+    use_thread_share(threads)
+    preload_models()
+    _report_model_stats()
+
+
+def _report_model_stats():
+    from app.whisper_models import get_model_stats
+    _worker_events.put((None, 'models', {'pid': os.getpid(), 'models': get_model_stats()}))
+
+
+def _report_cache_stats():
+    from app.transcript_cache import get_transcript_cache
+    from app.llm_cache import get_llm_cache
+    from app.image_cache import get_image_cache
+    caches = {
+        'transcripts': get_transcript_cache().counters(),
+        'llm': get_llm_cache().counters(),
+        'images': get_image_cache().counters(),
+    }
+    _worker_events.put((None, 'caches', {'pid': os.getpid(), 'caches': caches}))
+
+
+def report(event, data=None):
+    """Send an event about the job this worker is running to the web process (no-op elsewhere)"""
+    if _worker_events is not None and _current_job_id is not None:
+        _worker_events.put((_current_job_id, event, data))
+
+
+def _run_job(job_id, source, options):
+    """Worker entry point: run the pipeline for one job"""
+    global _current_job_id
+    _current_job_id = job_id
+    try:
+        report('running')
+        from app.pipeline import process_video
+        return process_video(source, **options)
+    finally:
+        _current_job_id = None
+        _report_model_stats()
+        _report_cache_stats()
+
+
+def _warm_worker():
+    """No-op task; submitting one per worker makes the pool start them all"""
+    return os.getpid()
+
+
+def _listen(events):
+    """Apply worker events to the job records (runs on a thread in the web process)"""
+    while True:
+        job_id, event, data = events.get()
+        with _jobs_lock:
+            if event == 'models':
+                _worker_model_stats[data['pid']] = data['models']
+                continue
+            if event == 'caches':
+                _worker_cache_counters[data['pid']] = data['caches']
+                continue
+            job = _jobs.get(job_id)
+            if job is None or job['status'] not in ACTIVE_STATES:
+                # The result can arrive before this event; never move a finished job back
+                continue
+            if event == 'running':
+                job['status'] = 'running'
+                job['started'] = time.time()
+                _add_event(job, 'status', {'status': 'running'})
+            elif event == 'stage':
+                job['stage'] = data['stage']
+                job['percent'] = data['percent']
+                _add_event(job, 'stage', data)
+            elif event in ('segment', 'token'):
+                _add_event(job, event, data)
+
+
+def _add_event(job, event, data):
+    """Record an event for the job's progress stream; call with _jobs_lock held"""
+    job['events'].append((len(job['events']), event, data))
+
+
+def _get_pool():
+    global _pool, _events
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context('spawn')
+            if _events is None:
+                _events = context.Queue()
+                threading.Thread(target=_listen, args=(_events,), daemon=True, name='job-events').start()
+            workers = Config.JOB_WORKERS
+            from app.whisper_models import thread_share
+            threads = thread_share(workers)
+            # spawn, not fork: the web process runs threads (event loop, listeners) that fork would not copy
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(_events, threads),
+            )
+        return _pool
+
+
+def _reset_pool(broken_pool):
+    """Drop a pool whose worker died (e.g. killed for memory) so the next job gets a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is broken_pool:
+            _pool = None
+
+
+def _finish(job_id, pool, future):
+    global _seconds_per_audio_second
+    with _jobs_lock:
+        _dispatched.discard(job_id)
+        job = _jobs.get(job_id)
+        if job is None:
+            _dispatch()
+            return
+        job['finished'] = time.time()
+        try:
+            job['result'] = future.result()
+            job['status'] = 'done'
+        except BrokenProcessPool:
+            job['status'] = 'failed'
+            job['error'] = 'The worker processing this video stopped unexpectedly'
+        except Exception as e:
+            job['status'] = 'failed'
+            job['error'] = str(e)
+        _add_event(job, 'status', {'status': job['status'], 'error': job['error']})
+        if job['status'] == 'done' and job['cost']:
+            # Learn how fast the workers really are, for Retry-After estimates
+            rate = (job['finished'] - (job['started'] or job['dispatched'])) / job['cost']
+            _seconds_per_audio_second += RATE_SMOOTHING * (rate - _seconds_per_audio_second)
+    if job['status'] == 'failed':
+        print(f"❌ Job {job_id} failed: {job['error']}")
+        if isinstance(future.exception(), BrokenProcessPool):
+            _reset_pool(pool)
+    else:
+        print(f"✅ Job {job_id} done in {job['finished'] - job['created']:.1f}s")
+    with _jobs_lock:
+        _dispatch()
+
+
+def _expire_jobs():
+    cutoff = time.time() - Config.JOB_RESULT_TTL_MINUTES * 60
+    with _jobs_lock:
+        for job_id in [job_id for job_id, job in _jobs.items()
+                       if job['status'] not in ACTIVE_STATES and (job['updated'] or job['finished']) < cutoff]:
+            del _jobs[job_id]
+
+
+def start_workers():
+    """Start every job worker now so the first upload does not wait for process start and model load"""
+    pool = _get_pool()
+    for _ in range(Config.JOB_WORKERS):
+        pool.submit(_warm_worker)
+
+
+def shutdown_workers():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _active_jobs(owner=None):
+    return [job for job in _jobs.values()
+            if job['status'] in ACTIVE_STATES and (owner is None or job['owner'] == owner)]
+
+
+def _retry_after(jobs):
+    """Seconds until the given active jobs are likely to have finished"""
+    remaining = sum(job['cost'] for job in jobs) * _seconds_per_audio_second
+    return max(MIN_RETRY_AFTER_SECONDS, math.ceil(remaining / max(1, Config.JOB_WORKERS)))
+
+
+def check_admission(owner=None, cost=0):
+    """
+    Raise QueueFullException if a job of `cost` audio seconds would be refused
+
+    Called before an upload starts as well as on submit, so a saturated
+    server turns clients away before they send the whole file.
+    """
+    with _jobs_lock:
+        own_jobs = _active_jobs(owner) if owner is not None else []
+        if owner is not None and len(own_jobs) >= Config.MAX_ACTIVE_JOBS_PER_USER:
+            raise QueueFullException(
+                f"You already have {len(own_jobs)} videos processing; wait for one to finish",
+                _retry_after([min(own_jobs, key=lambda job: job['cost'])]))
+
+        active = _active_jobs()
+        queued_cost = sum(job['cost'] for job in active)
+        if len(active) >= Config.JOB_QUEUE_MAX or (
+                active and queued_cost + cost > Config.JOB_QUEUE_MAX_AUDIO_MINUTES * 60):
+            raise QueueFullException("The server is busy processing other videos; try again shortly",
+                                     _retry_after(active))
+
+
+def _next_job_id():
+    """
+    Pick the waiting job to run next
+
+    Users with fewer running jobs go first, and a user already at
+    MAX_RUNNING_JOBS_PER_USER only gets a worker when nobody else is
+    waiting. Within that, the job with the least estimated work left after
+    subtracting how long it has waited wins: short clips overtake long
+    videos, but a long video cannot be overtaken forever.
+    """
+    running = {}
+    for job_id in _dispatched:
+        owner = _jobs[job_id]['owner'] if job_id in _jobs else None
+        running[owner] = running.get(owner, 0) + 1
+
+    now = time.time()
+
+    def priority(job_id):
+        job = _jobs[job_id]
+        user_running = running.get(job['owner'], 0)
+        over_cap = user_running >= Config.MAX_RUNNING_JOBS_PER_USER
+        expected_seconds = job['cost'] * _seconds_per_audio_second
+        return (over_cap, user_running, expected_seconds - (now - job['created']))
+
+    return min(_waiting, key=priority) if _waiting else None
+
+
+def _dispatch():
+    """Hand waiting jobs to free workers; call with _jobs_lock held"""
+    while _waiting and len(_dispatched) < Config.JOB_WORKERS:
+        job_id = _next_job_id()
+        _waiting.remove(job_id)
+        job = _jobs.get(job_id)
+        if job is None or job['status'] != 'queued':
+            continue
+
+        # Jobs still ahead of or alongside this one; the worker uses it for model tiering
+        options = dict(job['options'], queue_depth=len(_waiting) + len(_dispatched))
+        pool = _get_pool()
+        try:
+            future = pool.submit(_run_job, job_id, job['source'], options)
+        except BrokenProcessPool:
+            _reset_pool(pool)
+            pool = _get_pool()
+            future = pool.submit(_run_job, job_id, job['source'], options)
+        job['dispatched'] = time.time()
+        _dispatched.add(job_id)
+        future.add_done_callback(lambda f, job_id=job_id, pool=pool: _finish(job_id, pool, f))
+
+
+def submit_job(source, options=None, owner=None, cost=None):
+    """
+    Admit a video for processing and return its job id immediately
+
+    `source` and `options` are passed to pipeline.process_video in a
+    worker; `owner` identifies the session allowed to read the job and
+    `cost` is the estimated audio seconds to transcribe. Raises
+    QueueFullException when the queue or the user is at capacity.
+    """
+    _expire_jobs()
+    cost = Config.DEFAULT_JOB_AUDIO_SECONDS if cost is None else cost
+    job_id = uuid.uuid4().hex
+    with _jobs_lock:
+        check_admission(owner, cost)
+        _jobs[job_id] = {
+            'job_id': job_id,
+            'owner': owner,
+            'status': 'queued',
+            'source': source,
+            'options': dict(options or {}),
+            'cost': cost,
+            'created': time.time(),
+            'dispatched': None,
+            'started': None,
+            'finished': None,
+            'updated': None,
+            'result': None,
+            'error': None,
+            'stage': None,
+            'percent': None,
+            'events': [],
+        }
+        _add_event(_jobs[job_id], 'status', {'status': 'queued'})
+        _waiting.append(job_id)
+        print(f"Queued job {job_id} (~{cost:.0f}s of audio, {len(_waiting) - 1} waiting ahead)")
+        _dispatch()
+    return job_id
+
+
+def get_job(job_id, owner=None):
+    """A copy of the job record, or None if unknown, expired or owned by someone else"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None or (owner is not None and job['owner'] != owner):
+            return None
+        return dict(job)
+
+
+def update_job_result(job_id, changes, owner=None):
+    """
+    Merge `changes` into a finished job's result, e.g. post texts edited on the review page
+
+    Also restarts the job's expiry, so a post still being reviewed outlives
+    JOB_RESULT_TTL_MINUTES. Returns the updated result, or None if the job
+    is gone or unfinished.
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None or job['status'] != 'done' or (owner is not None and job['owner'] != owner):
+            return None
+        job['result'] = dict(job['result'], **changes)
+        job['updated'] = time.time()
+        return dict(job['result'])
+
+
+def job_status(job):
+    """Public view of a job record for the status endpoint"""
+    status = {
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'estimated_audio_seconds': job['cost'],
+        'created': job['created'],
+        'started': job['started'],
+        'finished': job['finished'],
+        'stage': job['stage'],
+        'percent': job['percent'],
+    }
+    if job['status'] == 'queued':
+        with _jobs_lock:
+            ahead = [other for other in _active_jobs() if other['created'] < job['created']]
+        status['jobs_ahead'] = len(ahead)
+    elif job['status'] == 'done':
+        status['result'] = job['result']
+    elif job['status'] == 'failed':
+        status['error'] = job['error']
+    return status
+
+
+def job_events(job_id, since=0):
+    """Progress events of a job from sequence number `since` on, as (seq, event, data) tuples"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return list(job['events'][since:]) if job else []
+
+
+def worker_model_stats():
+    """Models loaded in each job worker, keyed by worker pid"""
+    with _jobs_lock:
+        return {str(pid): dict(models) for pid, models in _worker_model_stats.items()}
+
+
+def worker_cache_counters(name):
+    """DiskCache.counters() of cache `name` in each job worker that has finished a job"""
+    with _jobs_lock:
+        return [dict(caches[name]) for caches in _worker_cache_counters.values() if name in caches]
+
+
+def job_stats():
+    """Job counts by state plus the scheduler's view of the queue"""
+    with _jobs_lock:
+        counts = {state: 0 for state in JOB_STATES}
+        for job in _jobs.values():
+            counts[job['status']] += 1
+        return {
+            'jobs': counts,
+            'waiting': len(_waiting),
+            'dispatched': len(_dispatched),
+            'queued_audio_seconds': round(sum(job['cost'] for job in _active_jobs())),
+            'seconds_per_audio_second': round(_seconds_per_audio_second, 3),
+        }
@@ -0,0 +1,144 @@
+"""Post images taken from the video itself: scene-change keyframes scored for sharpness, exposure and content"""
+import io
+import os
+import subprocess
+import tempfile
+import numpy as np
+import requests
+from PIL import Image
+from app.config import Config
+from app.audio import probe_duration
+
+# Frames are scored at this width; enough detail for sharpness, cheap to analyse
+SCORE_WIDTH = 256
+# Frames darker or brighter than this (mean luminance, 0-1) are fades, black or blown out
+MIN_BRIGHTNESS = 0.08
+MAX_BRIGHTNESS = 0.92
+# Where to look when a video has too few scene changes (fractions of its duration)
+FALLBACK_POSITIONS = (0.1, 0.3, 0.5, 0.7, 0.9)
+SCORE_WEIGHTS = {'sharpness': 0.35, 'exposure': 0.25, 'faces': 0.25, 'text': 0.15}
+THUMBNAIL_TIMEOUT_SECONDS = 30
+
+
+def _scene_candidates(video_path, out_dir):
+    """
+    Write the first frame of each scene change to `out_dir`
+
+    Only keyframes are decoded (-skip_frame nokey), which is a small
+    fraction of the work of decoding the whole video.
+    """
+    cmd = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-skip_frame', 'nokey', '-i', video_path,
+        '-vf', f"select='gt(scene,{Config.KEYFRAME_SCENE_THRESHOLD})'", '-vsync', 'vfr',
+        '-frames:v', str(Config.KEYFRAME_CANDIDATES), '-q:v', '2',
+        os.path.join(out_dir, 'scene_%03d.jpg'),
+    ]
+    subprocess.run(cmd, capture_output=True, check=True)
+    return sorted(os.path.join(out_dir, name) for name in os.listdir(out_dir) if name.startswith('scene_'))
+
+
+def _sampled_candidates(video_path, out_dir):
+    """Frames at fixed points through the video, for recordings without clear scene changes"""
+    duration = probe_duration(video_path)
+    if not duration:
+        return []
+    paths = []
+    for index, position in enumerate(FALLBACK_POSITIONS):
+        path = os.path.join(out_dir, f'sample_{index:03d}.jpg')
+        cmd = [
+            'ffmpeg', '-nostdin', '-loglevel', 'error', '-ss', f'{duration * position:.2f}', '-i', video_path,
+            '-frames:v', '1', '-q:v', '2', path,
+        ]
+        if subprocess.run(cmd, capture_output=True).returncode == 0 and os.path.exists(path):
+            paths.append(path)
+    return paths
+
+
+def frame_features(image):
+    """Raw quality measures of a PIL image: sharpness, exposure, and face/text proxies"""
+    image = image.convert('RGB')
+    image.thumbnail((SCORE_WIDTH, SCORE_WIDTH))
+    rgb = np.asarray(image, dtype=np.float32) / 255.0
+    gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+    # Variance of the Laplacian: blurred and motion-smeared frames score low
+    laplacian = (gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:] - 4 * gray[1:-1, 1:-1])
+    brightness = float(gray.mean())
+
+    # Skin-tone share (YCbCr box) stands in for a face detector
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    cb = 0.5 - 0.168736 * r - 0.331264 * g + 0.5 * b
+    cr = 0.5 + 0.5 * r - 0.418688 * g - 0.081312 * b
+    skin = (cb > 0.30) & (cb < 0.50) & (cr > 0.52) & (cr < 0.68) & (gray > 0.2)
+
+    # Text is many short, strong horizontal transitions packed into rows
+    horizontal = np.abs(np.diff(gray, axis=1)) > 0.25
+    row_density = horizontal.mean(axis=1)
+
+    return {
+        'sharpness': float(laplacian.var()),
+        'brightness': brightness,
+        'exposure': max(0.0, 1.0 - 2 * abs(brightness - 0.5)) * min(1.0, float(gray.std()) * 4),
+        'faces': float(skin.mean()),
+        'text': float((row_density > 0.08).mean()),
+    }
+
+
+def score_frames(features):
+    """One score per frame: each measure scaled to 0-1 across the candidates, then weighted"""
+    scores = np.zeros(len(features))
+    for name, weight in SCORE_WEIGHTS.items():
+        values = np.array([f[name] for f in features], dtype=np.float64)
+        spread = values.max() - values.min()
+        scores += weight * ((values - values.min()) / spread if spread > 0 else np.full(len(values), 0.5))
+    return scores
+
+
+def extract_keyframe(video_path, output_path):
+    """
+    Save the best-looking frame of the video to `output_path` (PNG)
+
+    Returns `output_path`, or None if the file has no usable video frames
+    or ffmpeg fails.
+    """
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            candidates = _scene_candidates(video_path, temp_dir)
+            if len(candidates) < 3:
+                candidates += _sampled_candidates(video_path, temp_dir)
+
+            frames = []
+            for path in candidates:
+                with Image.open(path) as image:
+                    features = frame_features(image)
+                if MIN_BRIGHTNESS <= features['brightness'] <= MAX_BRIGHTNESS:
+                    frames.append((path, features))
+            if not frames:
+                print("No usable frames found for a keyframe image")
+                return None
+
+            scores = score_frames([features for _, features in frames])
+            best_path = frames[int(scores.argmax())][0]
+            print(f"🖼️ Keyframe image picked from {len(frames)} candidate frames")
+            with Image.open(best_path) as image:
+                image.convert('RGB').save(output_path, 'PNG')
+            return output_path
+    except FileNotFoundError:
+        print("ffmpeg is not installed or not on PATH; no keyframe image")
+        return None
+    except subprocess.CalledProcessError as e:
+        print(f"Keyframe extraction failed: {e.stderr.decode(errors='ignore').strip()}")
+        return None
+
+
+def save_thumbnail(url, output_path):
+    """Download a video thumbnail (e.g. YouTube's) and save it to `output_path` as PNG; None on failure"""
+    try:
+        response = requests.get(url, timeout=THUMBNAIL_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        with Image.open(io.BytesIO(response.content)) as image:
+            image.convert('RGB').save(output_path, 'PNG')
+        return output_path
+    except Exception as e:
+        print(f"Thumbnail download failed: {e}")
+        return None
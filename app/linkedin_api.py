@@ -1,6 +1,7 @@
 import requests
 from app.config import Config
 from app.exceptions import TokenExpiredException
+from app.renditions import platform_image
 
 def get_authorization_url():
     params = {
@@ -123,6 +124,7 @@ def post_to_linkedin(access_token, text, image_path=None):
     # Upload image if provided
     media_asset = None
     if image_path:
+        image_path = platform_image(image_path, 'linkedin')
         print(f"📎 Uploading image: {image_path}")
         media_asset = upload_image_to_linkedin(access_token, image_path)
         if not media_asset:
@@ -0,0 +1,189 @@
+"""Cache of chat completions keyed by request, with single-flight for identical concurrent calls"""
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from app.config import Config
+from app.disk_cache import DiskCache
+from app.exceptions import InvalidCompletionException
+from app.openai_client import call_openai
+
+# Cross-process single-flight uses this many lock files, picked by key hash
+LOCK_STRIPES = 256
+
+_cache = None
+_inflight = {}   # cache key -> Future of the call this process is making for it
+_inflight_lock = threading.Lock()
+
+
+def get_llm_cache():
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(Config.LLM_CACHE_DIR, Config.LLM_CACHE_MAX_MB * 1024 * 1024,
+                           ttl_seconds=Config.LLM_CACHE_TTL_HOURS * 3600)
+    return _cache
+
+
+def llm_cache_key(model, messages, temperature, max_tokens, response_format=None):
+    """Everything that determines a completion, as one canonical string"""
+    request = {
+        'model': model,
+        'messages': messages,
+        'temperature': temperature,
+        'max_tokens': max_tokens,
+    }
+    if response_format:
+        request['response_format'] = response_format
+    return json.dumps(request, sort_keys=True, separators=(',', ':'))
+
+
+@contextmanager
+def _process_lock(key):
+    """Exclusive lock shared by every worker process asking for the same key"""
+    lock_dir = os.path.join(Config.LLM_CACHE_DIR, 'locks')
+    os.makedirs(lock_dir, exist_ok=True)
+    stripe = int(hashlib.sha256(key.encode('utf-8')).hexdigest()[:8], 16) % LOCK_STRIPES
+    with open(os.path.join(lock_dir, f"{stripe:03d}.lock"), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def cached_chat_completion(client, model, messages, temperature, max_tokens, timeout=None, regenerate=False,
+                           response_format=None, on_token=None, validate=None, truncated=None):
+    """
+    Text of a chat completion, reusing a stored answer to an identical request
+
+    Identical requests made at the same time share one API call: threads in
+    this process wait on the caller already making it, and other processes
+    wait on a lock file and then read its answer from the cache.
+    `regenerate` skips the stored answer and replaces it with a fresh one.
+    `on_token(text, first)` receives the answer as it streams in; a reused
+    answer arrives as one piece.
+    `validate(content)` raises InvalidCompletionException for an unusable
+    answer; answers failing it are never cached, and stored ones are
+    dropped. An answer cut off at `max_tokens` goes through
+    `truncated(content)`, which returns a usable version of it (e.g. cut
+    to its last sentence) or raises; without it, cut-off answers raise.
+    """
+    if not Config.LLM_CACHE_ENABLED:
+        return _checked(_complete(client, model, messages, temperature, max_tokens, timeout, response_format,
+                                  on_token), validate, truncated)
+
+    cache = get_llm_cache()
+    key = llm_cache_key(model, messages, temperature, max_tokens, response_format)
+    if not regenerate:
+        cached = _cached_content(cache, key, validate)
+        if cached is not None:
+            print("✅ LLM cache hit")
+            return _replay(cached, on_token)
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+    if not leader:
+        print("Waiting on an identical in-flight LLM request")
+        return _replay(future.result(), on_token)
+
+    try:
+        with _process_lock(key):
+            # Another process may have answered while this one waited for the lock;
+            # the lookup above already counted this request
+            cached = None if regenerate else _cached_content(cache, key, validate, count=False)
+            if cached is not None:
+                content = _replay(cached, on_token)
+            else:
+                content = _checked(_complete(client, model, messages, temperature, max_tokens, timeout,
+                                             response_format, on_token), validate, truncated)
+                cache.set_json(key, {'model': model, 'content': content})
+        future.set_result(content)
+        return content
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _cached_content(cache, key, validate, count=True):
+    cached = cache.get_json(key, count)
+    if not cached:
+        return None
+    try:
+        return _checked(cached['content'], validate)
+    except InvalidCompletionException as e:
+        print(f"⚠️ Dropping unusable cached LLM answer: {e.message}")
+        cache.delete(key)
+        return None
+
+
+def _checked(completion, validate, truncated=None):
+    """The content of a (content, finish_reason) pair, or a stored content string, once it passes `validate`"""
+    content, finish_reason = completion if isinstance(completion, tuple) else (completion, None)
+    if finish_reason == 'length':
+        if truncated is None:
+            raise InvalidCompletionException("Completion was cut off at max_tokens")
+        content = truncated(content)
+    if validate is not None:
+        validate(content)
+    return content
+
+
+def _complete(client, model, messages, temperature, max_tokens, timeout, response_format=None, on_token=None):
+    """(content, finish_reason) of a fresh completion"""
+    extra = {'response_format': response_format} if response_format else {}
+    if on_token is None:
+        response = call_openai(
+            client.chat.completions.create,
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout,
+            **extra
+        )
+        return response.choices[0].message.content, response.choices[0].finish_reason
+
+    def stream_completion(**kwargs):
+        # Consumed inside call_openai() so the stream counts against the concurrency limit,
+        # and a retried stream starts over with first=True
+        parts = []
+        finish_reason = None
+        for chunk in client.chat.completions.create(stream=True, **kwargs):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                on_token(delta, not parts)
+                parts.append(delta)
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+        return ''.join(parts), finish_reason
+
+    return call_openai(
+        stream_completion,
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        timeout=timeout,
+        **extra
+    )
+
+
+def _replay(content, on_token):
+    if on_token is not None:
+        on_token(content, True)
+    return content
+
+
+def llm_cache_stats(other_counters=()):
+    return get_llm_cache().stats(other_counters)
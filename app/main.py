@@ -1,22 +1,38 @@
 from fastapi import FastAPI, Request, Form, File, UploadFile, HTTPException, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
 import os
+import json
+import uuid
+import asyncio
 from typing import Optional
 from app.config import Config
-from app.video_processor import extract_transcript
-from app.content_generator import generate_linkedin_post
 from app.linkedin_api import get_authorization_url, get_access_token, post_to_linkedin
 from app.facebook_api import get_facebook_authorization_url, get_facebook_access_token, post_to_facebook
 from app.instagram_api import get_instagram_authorization_url, get_instagram_access_token, post_to_instagram
-from app.exceptions import TokenExpiredException
-import tempfile
-import shutil
+from app.exceptions import TokenExpiredException, UploadException, UploadTooLargeException, QueueFullException
+from app.pipeline import estimate_audio_seconds, discard_source, IMAGE_MODES
+from app.jobs import check_admission, submit_job, get_job, update_job_result, job_status, job_events, job_stats, worker_model_stats, worker_cache_counters, start_workers, shutdown_workers
+from app.transcript_cache import transcript_cache_stats
+from app.llm_cache import llm_cache_stats
+from app.image_cache import image_cache_stats
+from app.content_generator import generate_post_text, platform_variants, PLATFORM_LIMITS
+from app.uploads import (
+    max_upload_bytes, save_stream, create_upload, upload_status, append_chunk,
+    complete_upload, completed_upload
+)
 
 app = FastAPI(title="Video to Social Media Pipeline")
 
+# Room for multipart boundaries and the other form fields around an upload
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+# How often the progress stream checks for new job events, and how long it may stay silent
+SSE_POLL_SECONDS = 0.25
+SSE_KEEPALIVE_SECONDS = 15
+
 # Validate configuration on startup
 Config.validate_config()
 
@@ -33,28 +49,79 @@ os.makedirs(Config.IMAGES_FOLDER, exist_ok=True)
 # Serve static images
 app.mount("/images", StaticFiles(directory=Config.IMAGES_FOLDER), name="images")
 
+@app.on_event("startup")
+def start_job_workers():
+    # Workers load their models (WHISPER_PRELOAD_MODELS) as they start
+    start_workers()
+
+@app.on_event("shutdown")
+def stop_job_workers():
+    shutdown_workers()
+
+@app.get("/stats/models")
+async def model_stats():
+    return JSONResponse(worker_model_stats())
+
+@app.get("/stats/jobs")
+async def jobs_stats():
+    return JSONResponse(job_stats())
+
+@app.get("/stats/cache")
+async def cache_stats():
+    # Most lookups happen in the job workers; add their counters to this process's
+    return JSONResponse({
+        "transcripts": transcript_cache_stats(worker_cache_counters('transcripts')),
+        "llm": llm_cache_stats(worker_cache_counters('llm')),
+        "images": image_cache_stats(worker_cache_counters('images')),
+    })
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # Refuse oversized bodies from their Content-Length, before Starlette spools them to disk
+    length = request.headers.get('content-length')
+    if request.method in ('POST', 'PUT') and length and length.isdigit():
+        if int(length) > max_upload_bytes() + MULTIPART_OVERHEAD_BYTES:
+            return JSONResponse({"error": UploadTooLargeException(max_upload_bytes()).message}, status_code=413)
+    return await call_next(request)
+
+async def _read_chunks(upload_file: UploadFile, chunk_size: int = 1024 * 1024):
+    while True:
+        chunk = await upload_file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
 def allowed_file(filename: str) -> bool:
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     posts = request.session.get('posted_content', [])
-    return templates.TemplateResponse("index.html", {"request": request, "posts": posts})
+    return templates.TemplateResponse("index.html", {"request": request, "posts": posts, "image_mode": Config.IMAGE_MODE})
 
 @app.post("/upload")
 async def upload_video(
     request: Request,
     video_file: Optional[UploadFile] = File(None),
-    youtube_url: Optional[str] = Form(None)
+    youtube_url: Optional[str] = Form(None),
+    upload_id: Optional[str] = Form(None),  # Set when the browser used the resumable upload API
+    full_transcript: bool = Form(False),
+    regenerate: bool = Form(False),  # Write a fresh post instead of reusing a cached one
+    image_mode: Optional[str] = Form(None)  # 'dalle', 'keyframe' or 'none'; Config.IMAGE_MODE if unset
 ):
     
-    if not video_file and not youtube_url:
+    if not video_file and not youtube_url and not upload_id:
         request.session['error'] = 'No video source provided'
         return RedirectResponse(url="/", status_code=303)
     
+    source = {}
     try:
         if youtube_url:
-            transcript = extract_transcript(youtube_url)
+            source = {'youtube_url': youtube_url}
+        elif upload_id:
+            # Already streamed to disk and hashed by the /uploads endpoints
+            file_path, content_hash, _ = completed_upload(upload_id)
+            source = {'file_path': file_path, 'content_hash': content_hash, 'upload_id': upload_id}
         else:
             if not video_file or video_file.filename == '':
                 request.session['error'] = 'No file selected'
@@ -64,60 +131,218 @@ async def upload_video(
                 request.session['error'] = 'Invalid file type'
                 return RedirectResponse(url="/", status_code=303)
             
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(video_file.filename)[1]) as tmp_file:
-                shutil.copyfileobj(video_file.file, tmp_file)
-                tmp_path = tmp_file.name
-            
-            try:
-                transcript = extract_transcript(tmp_path)
-            finally:
-                os.unlink(tmp_path)
-        
-        # Extract video title if available
-        video_title = transcript.get('title', 'Video Content Analysis')
+            # Plain multipart fallback (no JavaScript): Starlette has already spooled the
+            # file to a temporary file, so this is a second full write; browsers with
+            # JavaScript use the resumable /uploads API, which writes each byte once
+            file_path, content_hash, _ = await save_stream(_read_chunks(video_file), video_file.filename)
+            source = {'file_path': file_path, 'content_hash': content_hash}
         
-        result = generate_linkedin_post(transcript['text'], video_title)
-        
-        # Handle both string and dict returns (for image support)
-        if isinstance(result, dict):
-            linkedin_post = result.get('post', result.get('content', ''))
-            image_path = result.get('image_url')
-            
-            # Convert local path to web URL for preview
-            if image_path and os.path.exists(image_path):
-                image_filename = os.path.basename(image_path)
-                image_url = f"/images/{image_filename}"
-            else:
-                image_url = image_path  # Keep original if it's HTTP URL
-        else:
-            linkedin_post = result
-            image_url = None
-            image_path = None
-        
-        pending_post_data = {
-            'transcript': transcript['text'],
-            'linkedin_post': linkedin_post,
-            'image_url': image_url,  # Web URL for preview
-            'image_path': image_path,  # Local path for uploading
-            'video_title': video_title
-        }
-        request.session['pending_post'] = pending_post_data
-        
-        return templates.TemplateResponse("review.html", {
-            "request": request,
-            "transcript": transcript['text'],
-            "linkedin_post": linkedin_post,
-            "video_title": video_title,
-            "image_url": image_url,
-            "image_available": image_url is not None,
-            "linkedin_authenticated": request.session.get('linkedin_access_token') is not None,
-            "facebook_authenticated": request.session.get('facebook_access_token') is not None,
-            "instagram_authenticated": request.session.get('instagram_access_token') is not None
-        })
+        # Download, transcription and generation run on the job workers
+        cost = await run_in_threadpool(estimate_audio_seconds, source, full_transcript)
+        options = {'full_transcript': full_transcript, 'regenerate': regenerate,
+                   'image_mode': image_mode if image_mode in IMAGE_MODES else Config.IMAGE_MODE}
+        job_id = submit_job(source, options, owner=_client_id(request), cost=cost)
+    except QueueFullException as e:
+        discard_source(source)
+        return _queue_full_response(request, e)
     except Exception as e:
+        discard_source(source)
         request.session['error'] = f'Error processing video: {str(e)}'
         return RedirectResponse(url="/", status_code=303)
+    
+    if _wants_json(request):
+        return JSONResponse({"job_id": job_id, "status_url": f"/jobs/{job_id}/status"}, status_code=202)
+    return RedirectResponse(url=f"/jobs/{job_id}", status_code=303)
+
+def _wants_json(request: Request) -> bool:
+    return 'application/json' in request.headers.get('accept', '')
+
+def _queue_full_response(request: Request, error: QueueFullException):
+    """429 with Retry-After, as JSON for API clients or the upload page for browsers"""
+    headers = {"Retry-After": str(error.retry_after)}
+    if _wants_json(request):
+        return JSONResponse({"error": error.message, "retry_after": error.retry_after},
+                            status_code=429, headers=headers)
+    request.session['error'] = f"{error.message} (about {error.retry_after} seconds)"
+    posts = request.session.get('posted_content', [])
+    return templates.TemplateResponse("index.html", {"request": request, "posts": posts, "image_mode": Config.IMAGE_MODE},
+                                      status_code=429, headers=headers)
+
+def _client_id(request: Request) -> str:
+    """Stable per-browser id stored in the session; jobs are only visible to their owner"""
+    if 'client_id' not in request.session:
+        request.session['client_id'] = uuid.uuid4().hex
+    return request.session['client_id']
+
+@app.get("/jobs/{job_id}/status")
+async def get_job_status(request: Request, job_id: str):
+    job = get_job(job_id, owner=_client_id(request))
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    return JSONResponse(job_status(job))
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(request: Request, job_id: str):
+    """
+    Server-Sent Events: status changes, stage progress, transcript segments and post tokens as they happen
+
+    Each event carries its sequence number as the SSE id, so a reconnecting
+    EventSource resumes after the last event it saw (Last-Event-ID).
+    """
+    owner = _client_id(request)
+    if get_job(job_id, owner=owner) is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    
+    last_event_id = request.headers.get('last-event-id', '')
+    position = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+    
+    async def event_stream():
+        nonlocal position
+        jobs_ahead = None
+        idle_seconds = 0.0
+        while not await request.is_disconnected():
+            job = get_job(job_id, owner=owner)
+            if job is None:
+                break
+            events = job_events(job_id, position)
+            for seq, event, data in events:
+                yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+                position = seq + 1
+            if job['status'] in ('done', 'failed') and not job_events(job_id, position):
+                break
+            if job['status'] == 'queued':
+                ahead = job_status(job).get('jobs_ahead')
+                if ahead != jobs_ahead:
+                    jobs_ahead = ahead
+                    yield f"event: queue\ndata: {json.dumps({'jobs_ahead': ahead})}\n\n"
+            
+            idle_seconds = 0.0 if events else idle_seconds + SSE_POLL_SECONDS
+            if idle_seconds >= SSE_KEEPALIVE_SECONDS:
+                # Comment line; keeps proxies from closing a quiet connection
+                yield ": keepalive\n\n"
+                idle_seconds = 0.0
+            await asyncio.sleep(SSE_POLL_SECONDS)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Disable response buffering in nginx
+    })
+
+@app.get("/jobs/{job_id}", response_class=HTMLResponse)
+async def job_page(request: Request, job_id: str):
+    job = get_job(job_id, owner=_client_id(request))
+    if job is None:
+        request.session['error'] = 'Job not found or expired'
+        return RedirectResponse(url="/", status_code=303)
+    if job['status'] == 'done':
+        return RedirectResponse(url=f"/jobs/{job_id}/review", status_code=303)
+    return templates.TemplateResponse("job.html", {"request": request, "job": job_status(job)})
+
+@app.get("/jobs/{job_id}/review", response_class=HTMLResponse)
+async def review_job(request: Request, job_id: str):
+    job = get_job(job_id, owner=_client_id(request))
+    if job is None:
+        request.session['error'] = 'Job not found or expired'
+        return RedirectResponse(url="/", status_code=303)
+    if job['status'] == 'failed':
+        request.session['error'] = f"Error processing video: {job['error']}"
+        return RedirectResponse(url="/", status_code=303)
+    if job['status'] != 'done':
+        return RedirectResponse(url=f"/jobs/{job_id}", status_code=303)
+    
+    # Only the job id goes in the cookie; the post, its variants and the transcript stay in the job record
+    request.session['pending_job_id'] = job_id
+    return _review_page(request, update_job_result(job_id, {}, owner=_client_id(request)))
+
+def _pending_post(request: Request):
+    """The post under review (the job's result), or None once the job has expired"""
+    job_id = request.session.get('pending_job_id')
+    return update_job_result(job_id, {}, owner=_client_id(request)) if job_id else None
+
+@app.post("/regenerate")
+async def regenerate_post(request: Request):
+    """Write a new post for the pending transcript, bypassing the LLM cache"""
+    pending_post = _pending_post(request)
+    if not pending_post:
+        request.session['error'] = 'No pending post to regenerate'
+        return RedirectResponse(url="/", status_code=303)
+    
+    try:
+        post_variants = await run_in_threadpool(
+            generate_post_text, pending_post['transcript'], pending_post.get('video_title'), True
+        )
+    except Exception as e:
+        request.session['error'] = f'Failed to regenerate post: {str(e)}'
+        return _review_page(request, pending_post)
+    
+    pending_post = _keep_edits(request, post_variants) or pending_post
+    return _review_page(request, pending_post)
+
+def _review_page(request: Request, pending_post: dict):
+    return templates.TemplateResponse("review.html", {
+        "request": request,
+        "transcript": pending_post['transcript'],
+        "transcript_source": pending_post.get('transcript_source'),
+        "transcript_partial": pending_post.get('transcript_partial', False),
+        "speech_ratio": pending_post.get('speech_ratio'),
+        "linkedin_post": pending_post['linkedin_post'],
+        "post_variants": pending_post.get('post_variants') or platform_variants(pending_post['linkedin_post']),
+        "platform_limits": PLATFORM_LIMITS,
+        "video_title": pending_post.get('video_title'),
+        "image_url": pending_post.get('image_url'),
+        "image_available": pending_post.get('image_url') is not None,
+        "can_regenerate": Config.OPENAI_API_KEY is not None,
+        "linkedin_authenticated": request.session.get('linkedin_access_token') is not None,
+        "facebook_authenticated": request.session.get('facebook_access_token') is not None,
+        "instagram_authenticated": request.session.get('instagram_access_token') is not None
+    })
+
+@app.post("/uploads")
+async def start_upload(request: Request, filename: str = Form(...), size: int = Form(...)):
+    """Begin a resumable upload; the browser then PUTs chunks at increasing offsets"""
+    try:
+        # Turn clients away before they send a large file the queue cannot take
+        check_admission(owner=_client_id(request))
+        upload_id = create_upload(filename, size)
+    except QueueFullException as e:
+        return JSONResponse({"error": e.message, "retry_after": e.retry_after},
+                            status_code=429, headers={"Retry-After": str(e.retry_after)})
+    except UploadException as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
+    return JSONResponse({
+        "upload_id": upload_id,
+        "chunk_size": Config.UPLOAD_CHUNK_MB * 1024 * 1024
+    }, status_code=201)
+
+@app.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """Bytes received so far, so an interrupted upload can resume from there"""
+    try:
+        return JSONResponse(upload_status(upload_id))
+    except UploadException as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
+
+@app.put("/uploads/{upload_id}")
+async def put_upload_chunk(request: Request, upload_id: str, offset: int):
+    try:
+        received = await append_chunk(upload_id, offset, request.stream())
+    except UploadException as e:
+        body = {"error": e.message}
+        if e.status_code == 409:
+            try:
+                body["received"] = upload_status(upload_id)["received"]
+            except UploadException:
+                pass
+        return JSONResponse(body, status_code=e.status_code)
+    return JSONResponse({"upload_id": upload_id, "received": received})
+
+@app.post("/uploads/{upload_id}/complete")
+async def finish_upload(upload_id: str):
+    try:
+        _, sha256, size = complete_upload(upload_id)
+    except UploadException as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
+    return JSONResponse({"upload_id": upload_id, "sha256": sha256, "size": size})
 
 @app.get("/auth/linkedin")
 async def linkedin_auth():
@@ -134,20 +359,10 @@ async def linkedin_callback(request: Request, code: Optional[str] = None):
         access_token = get_access_token(code)
         request.session['linkedin_access_token'] = access_token
         
-        pending_post = request.session.get('pending_post')
+        pending_post = _pending_post(request)
         
         if pending_post:
-            return templates.TemplateResponse("review.html", {
-                "request": request,
-                "transcript": pending_post['transcript'],
-                "linkedin_post": pending_post['linkedin_post'],
-                "video_title": pending_post.get('video_title'),
-                "image_url": pending_post.get('image_url'),  # Web URL for preview
-                "image_available": pending_post.get('image_url') is not None,
-                "linkedin_authenticated": True,
-                "facebook_authenticated": request.session.get('facebook_access_token') is not None,
-                "instagram_authenticated": request.session.get('instagram_access_token') is not None
-            })
+            return _review_page(request, pending_post)
         else:
             request.session['success'] = 'LinkedIn authentication successful!'
             return RedirectResponse(url="/", status_code=303)
@@ -173,19 +388,9 @@ async def facebook_callback(request: Request, code: Optional[str] = None):
         access_token = get_facebook_access_token(code)
         request.session['facebook_access_token'] = access_token
         
-        pending_post = request.session.get('pending_post')
+        pending_post = _pending_post(request)
         if pending_post:
-            return templates.TemplateResponse("review.html", {
-                "request": request,
-                "transcript": pending_post['transcript'],
-                "linkedin_post": pending_post['linkedin_post'],
-                "video_title": pending_post.get('video_title'),
-                "image_url": pending_post.get('image_url'),
-                "image_available": pending_post.get('image_url') is not None,
-                "linkedin_authenticated": request.session.get('linkedin_access_token') is not None,
-                "facebook_authenticated": True,
-                "instagram_authenticated": request.session.get('instagram_access_token') is not None
-            })
+            return _review_page(request, pending_post)
         else:
             request.session['success'] = 'Facebook authentication successful!'
             return RedirectResponse(url="/", status_code=303)
@@ -211,19 +416,9 @@ async def instagram_callback(request: Request, code: Optional[str] = None):
         access_token = get_instagram_access_token(code)
         request.session['instagram_access_token'] = access_token
         
-        pending_post = request.session.get('pending_post')
+        pending_post = _pending_post(request)
         if pending_post:
-            return templates.TemplateResponse("review.html", {
-                "request": request,
-                "transcript": pending_post['transcript'],
-                "linkedin_post": pending_post['linkedin_post'],
-                "video_title": pending_post.get('video_title'),
-                "image_url": pending_post.get('image_url'),
-                "image_available": pending_post.get('image_url') is not None,
-                "linkedin_authenticated": request.session.get('linkedin_access_token') is not None,
-                "facebook_authenticated": request.session.get('facebook_access_token') is not None,
-                "instagram_authenticated": True
-            })
+            return _review_page(request, pending_post)
         else:
             request.session['success'] = 'Instagram authentication successful!'
             return RedirectResponse(url="/", status_code=303)
@@ -250,8 +445,8 @@ async def post_linkedin(
         return RedirectResponse(url="/", status_code=303)
     
     try:
-        # Get image path from session if available
-        pending_post = request.session.get('pending_post', {})
+        # Get image path of the post under review, if any
+        pending_post = _pending_post(request) or {}
         image_path = pending_post.get('image_path')
         
         result = post_to_linkedin(final_token, post_text, image_path)
@@ -274,16 +469,31 @@ async def post_linkedin(
         request.session['error'] = f'Failed to post: {str(e)}'
         return RedirectResponse(url="/", status_code=303)
 
+def _keep_edits(request: Request, post_variants: dict):
+    """Store the texts submitted from the review page so it reopens with them"""
+    job_id = request.session.get('pending_job_id')
+    if not job_id:
+        return None
+    return update_job_result(job_id, {'linkedin_post': post_variants['linkedin'], 'post_variants': post_variants},
+                             owner=_client_id(request))
+
 @app.post("/post/social")
 async def post_social(
     request: Request,
     post_text: str = Form(...),
+    facebook_text: Optional[str] = Form(None),
+    instagram_text: Optional[str] = Form(None),
     platforms: Optional[str] = Form(None)  # Comma-separated platform list
 ):
-    """Post to multiple social media platforms simultaneously"""
+    """Post to multiple social media platforms simultaneously, each with its own text (LinkedIn's by default)"""
     if not post_text:
         request.session['error'] = 'No post content provided'
         return RedirectResponse(url="/", status_code=303)
+    post_variants = {
+        'linkedin': post_text,
+        'facebook': facebook_text or post_text,
+        'instagram': instagram_text or post_text,
+    }
     
     # Parse selected platforms
     selected_platforms = [p.strip() for p in platforms.split(',')] if platforms else []
@@ -291,8 +501,8 @@ async def post_social(
         request.session['error'] = 'No platforms selected'
         return RedirectResponse(url="/", status_code=303)
     
-    # Get image path from session
-    pending_post = request.session.get('pending_post', {})
+    # Get image path of the post under review
+    pending_post = _pending_post(request) or {}
     image_path = pending_post.get('image_path')
     
     results = []
@@ -319,7 +529,7 @@ async def post_social(
         facebook_token = request.session.get('facebook_access_token')
         if facebook_token:
             try:
-                result = post_to_facebook(facebook_token, post_text, image_path)
+                result = post_to_facebook(facebook_token, post_variants['facebook'], image_path)
                 results.append(f"Facebook (Post ID: {result.get('post_id', 'N/A')})")
             except TokenExpiredException as e:
                 # Clear expired token from session
@@ -338,7 +548,7 @@ async def post_social(
                 errors.append("Instagram: Requires an image")
             else:
                 try:
-                    result = post_to_instagram(instagram_token, post_text, image_path)
+                    result = post_to_instagram(instagram_token, post_variants['instagram'], image_path)
                     results.append(f"Instagram (Post ID: {result.get('post_id', 'N/A')})")
                 except TokenExpiredException as e:
                     # Clear expired token from session
@@ -352,9 +562,10 @@ async def post_social(
     # Save all results to session
     posted_content = request.session.get('posted_content', [])
     for platform_result in results:
+        platform = platform_result.split(' ')[0]
         posted_content.append({
-            'platform': platform_result.split(' ')[0],
-            'content': post_text[:100] + '...',
+            'platform': platform,
+            'content': post_variants[platform.lower()][:100] + '...',
             'post_id': 'See logs',
             'status': 'Posted'
         })
@@ -367,34 +578,14 @@ async def post_social(
     elif results and errors:
         # Some posted, some failed - show review page with new auth status
         request.session['warning'] = f'Posted to: {", ".join(results)}. Errors: {"; ".join(errors)}'
-        pending_post = request.session.get('pending_post', {})
+        pending_post = _keep_edits(request, post_variants)
         if pending_post:
-            return templates.TemplateResponse("review.html", {
-                "request": request,
-                "transcript": pending_post.get('transcript', ''),
-                "linkedin_post": post_text,
-                "video_title": pending_post.get('video_title', ''),
-                "image_url": pending_post.get('image_url'),
-                "image_available": pending_post.get('image_url') is not None,
-                "linkedin_authenticated": request.session.get('linkedin_access_token') is not None,
-                "facebook_authenticated": request.session.get('facebook_access_token') is not None,
-                "instagram_authenticated": request.session.get('instagram_access_token') is not None
-            })
+            return _review_page(request, pending_post)
         return RedirectResponse(url="/", status_code=303)
     else:
         # All failed - show review page with error and updated auth status
         request.session['error'] = f'Failed to post. Errors: {"; ".join(errors)}'
-        pending_post = request.session.get('pending_post', {})
+        pending_post = _keep_edits(request, post_variants)
         if pending_post:
-            return templates.TemplateResponse("review.html", {
-                "request": request,
-                "transcript": pending_post.get('transcript', ''),
-                "linkedin_post": post_text,
-                "video_title": pending_post.get('video_title', ''),
-                "image_url": pending_post.get('image_url'),
-                "image_available": pending_post.get('image_url') is not None,
-                "linkedin_authenticated": request.session.get('linkedin_access_token') is not None,
-                "facebook_authenticated": request.session.get('facebook_access_token') is not None,
-                "instagram_authenticated": request.session.get('instagram_access_token') is not None
-            })
+            return _review_page(request, pending_post)
         return RedirectResponse(url="/", status_code=303)
@@ -0,0 +1,73 @@
+"""One pooled OpenAI client per process, with a concurrency limit and jittered retries"""
+import random
+import threading
+import time
+import httpx
+import openai
+from openai import OpenAI
+from app.config import Config
+
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 30.0
+
+_client = None
+_client_lock = threading.Lock()
+_semaphore = threading.BoundedSemaphore(max(1, Config.OPENAI_MAX_CONCURRENCY))
+
+
+def _connection_limits():
+    # Enough kept-alive connections for every call the semaphore lets through
+    return httpx.Limits(max_connections=max(1, Config.OPENAI_MAX_CONCURRENCY) * 2,
+                        max_keepalive_connections=max(1, Config.OPENAI_MAX_CONCURRENCY))
+
+
+def get_openai_client():
+    """The process-wide OpenAI client; reuses HTTP connections and TLS sessions between calls"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            # Retries are done by call_openai() so they can be jittered and counted against the semaphore
+            _client = OpenAI(
+                api_key=Config.OPENAI_API_KEY,
+                timeout=Config.OPENAI_TIMEOUT_SECONDS,
+                max_retries=0,
+                http_client=httpx.Client(limits=_connection_limits()),
+            )
+        return _client
+
+
+def _is_retryable(error):
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _retry_delay(error, attempt):
+    """Full-jitter exponential backoff, or the server's Retry-After when it sends one"""
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    try:
+        return min(float(retry_after), RETRY_MAX_SECONDS)
+    except (TypeError, ValueError):
+        return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+def call_openai(method, *args, **kwargs):
+    """
+    Call an OpenAI client method under the concurrency limit, retrying 429/5xx
+
+    e.g. call_openai(client.chat.completions.create, model=..., timeout=30).
+    Pass `timeout` to override the client's default for this call.
+    """
+    attempt = 0
+    while True:
+        try:
+            with _semaphore:
+                return method(*args, **kwargs)
+        except Exception as e:
+            if not _is_retryable(e) or attempt >= Config.OPENAI_MAX_RETRIES:
+                raise
+            delay = _retry_delay(e, attempt)
+            attempt += 1
+            print(f"⚠️ OpenAI call failed ({type(e).__name__}), retry {attempt}/{Config.OPENAI_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
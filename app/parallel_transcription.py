@@ -0,0 +1,98 @@
+"""Transcribe long recordings as silence-aligned chunks across a process pool"""
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from app.config import Config
+from app.audio import split_on_silence, WHISPER_SAMPLE_RATE
+from app.transcriber import transcribe_audio, add_vad_stats
+from app.progress import report_segment
+from app.whisper_models import thread_share
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(threads):
+    """Split the CPU between workers and load the default model before the first chunk"""
+    from app.whisper_models import get_model, use_thread_share
+
+    use_thread_share(threads)
+    get_model()
+
+
+def _transcribe_chunk(pcm_path, total_samples, start, end, model_size):
+    """Worker entry point: transcribe audio[start:end] of the shared PCM file into (segments, vad stats)"""
+    audio = np.memmap(pcm_path, dtype=np.float32, mode='r', shape=(total_samples,))
+    # Copy only this worker's slice; torch needs a writable buffer
+    chunk = np.array(audio[start:end])
+    del audio
+    result = transcribe_audio(chunk, offset=start / WHISPER_SAMPLE_RATE, model_size=model_size)
+    return result["segments"], result.get("vad")
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = Config.TRANSCRIBE_WORKERS
+            threads = thread_share(workers)
+            # spawn, not fork: forking a process that already holds inference threads can deadlock
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(threads,),
+            )
+        return _pool
+
+
+def _shared_dir():
+    # /dev/shm keeps the PCM buffer in RAM while still being mappable by every worker
+    return '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def transcribe_parallel(audio, model_size=None):
+    """
+    Transcribe a 16 kHz mono float32 array in concurrent chunks
+
+    The audio is written once to a memory-mapped file, split at the
+    quietest point near each chunk boundary, and every worker reads its own
+    range. Segments come back with timestamps on the original timeline.
+    """
+    bounds = split_on_silence(audio, Config.PARALLEL_CHUNK_SECONDS)
+    if len(bounds) < 2:
+        return transcribe_audio(audio, model_size=model_size)
+
+    print(f"Transcribing {len(bounds)} chunks on {Config.TRANSCRIBE_WORKERS} workers")
+
+    fd, pcm_path = tempfile.mkstemp(suffix='.pcm', dir=_shared_dir())
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.ascontiguousarray(audio, dtype=np.float32).tofile(f)
+
+        pool = _get_pool()
+        futures = [pool.submit(_transcribe_chunk, pcm_path, len(audio), start, end, model_size)
+                   for start, end in bounds]
+
+        segments = []
+        vad_stats = {}
+        for future in futures:
+            chunk_segments, chunk_vad = future.result()
+            # Chunk workers cannot report; pass each chunk on in order as it completes
+            for segment in chunk_segments:
+                report_segment(segment)
+            segments.extend(chunk_segments)
+            add_vad_stats(vad_stats, {"vad": chunk_vad})
+    finally:
+        os.unlink(pcm_path)
+
+    segments.sort(key=lambda segment: segment["start"])
+    return {
+        "text": ''.join(segment["text"] for segment in segments),
+        "segments": segments,
+        "chunks": len(bounds),
+        "vad": vad_stats
+    }
@@ -0,0 +1,234 @@
+"""The video-to-post pipeline run by the background job workers"""
+import os
+from app.config import Config
+from app.audio import probe_duration
+from app.video_processor import extract_transcript, PARTIAL_MODES
+from app.content_generator import (
+    generate_linkedin_post, start_post_text, start_post_image, collect_generated_post, discard_image_future,
+    start_keyframe_image, new_post_image_path, prompt_transcript, POST_TRANSCRIPT_CHARS, IMAGE_TRANSCRIPT_CHARS
+)
+from app.keyframes import save_thumbnail
+from app.renditions import prepare_renditions
+from app.uploads import discard_upload
+from app.progress import (
+    reset as reset_progress, add_listener as add_progress_listener, remove_listener as remove_progress_listener
+)
+
+# Typical speaking rate, to turn the character budget into audio seconds
+SPOKEN_CHARS_PER_SECOND = 15
+# Where the post image comes from: a DALL-E render, a frame of the video, or nowhere
+IMAGE_MODES = ('dalle', 'keyframe', 'none')
+
+
+def process_video(source, full_transcript=False, queue_depth=None, regenerate=False, image_mode=None):
+    """
+    Download or read the video, transcribe it and generate the post
+
+    `source` is {"youtube_url": ...} or {"file_path", "content_hash"} plus
+    an optional "upload_id"; uploaded files are deleted once transcribed.
+    `regenerate` asks for a fresh post rather than a cached one.
+    `image_mode` is one of IMAGE_MODES (default Config.IMAGE_MODE). Returns
+    a JSON-serializable result for the review page.
+    """
+    reset_progress()
+    image_mode = image_mode if image_mode in IMAGE_MODES else Config.IMAGE_MODE
+    keyframe = None
+    if image_mode == 'keyframe' and source.get('file_path'):
+        # Scene detection only needs the file, so it runs alongside transcription
+        keyframe = start_keyframe_image(source['file_path'])
+    early = None
+    if Config.PIPELINED_GENERATION and Config.OPENAI_API_KEY and (
+            full_transcript or Config.TRANSCRIBE_MODE != 'sampled'):
+        # Sampled transcripts join their windows with " ... ", so the leading segments never match
+        early = EarlyGeneration(regenerate, generate_image=image_mode == 'dalle')
+        add_progress_listener(early.on_progress)
+    try:
+        if source.get('youtube_url'):
+            transcript = extract_transcript(source['youtube_url'], full_transcript=full_transcript,
+                                            queue_depth=queue_depth)
+        else:
+            transcript = extract_transcript(source['file_path'], full_transcript=full_transcript,
+                                            content_hash=source.get('content_hash'), queue_depth=queue_depth)
+    except Exception:
+        if early:
+            early.discard()
+        if keyframe:
+            # Deleted whenever it finishes; the failed job does not wait for it
+            discard_image_future(keyframe)
+            keyframe = None
+        raise
+    finally:
+        if early:
+            remove_progress_listener(early.on_progress)
+        keyframe_path = None
+        try:
+            if keyframe:
+                # The keyframe reads the uploaded file, so wait for it before discarding the upload
+                keyframe_path = keyframe.result()
+        except Exception as e:
+            print(f"⚠️ Keyframe image failed, continuing without it: {e}")
+        finally:
+            discard_source(source)
+
+    # Extract video title if available
+    video_title = transcript.get('title', 'Video Content Analysis')
+
+    if early:
+        result = early.finish(transcript['text'], video_title)
+    else:
+        result = generate_linkedin_post(transcript['text'], video_title, regenerate=regenerate,
+                                        generate_image=image_mode == 'dalle')
+    if image_mode == 'keyframe' and isinstance(result, dict):
+        if not keyframe_path and transcript.get('thumbnail'):
+            keyframe_path = save_thumbnail(transcript['thumbnail'], new_post_image_path())
+        result['image_url'] = keyframe_path
+
+    # Handle both string and dict returns (for image support)
+    if isinstance(result, dict):
+        linkedin_post = result.get('post', result.get('content', ''))
+        post_variants = result.get('variants')
+        image_path = result.get('image_url')
+
+        # Convert local path to web URL for preview
+        if image_path and os.path.exists(image_path):
+            # Rendered here on the worker so publishing only uploads
+            prepare_renditions(image_path)
+            image_filename = os.path.basename(image_path)
+            image_url = f"/images/{image_filename}"
+        else:
+            image_url = image_path  # Keep original if it's HTTP URL
+    else:
+        linkedin_post = result
+        post_variants = None
+        image_url = None
+        image_path = None
+
+    return {
+        'transcript': transcript['text'],
+        'transcript_source': transcript.get('source', 'whisper'),  # 'captions' or 'whisper'
+        'transcript_partial': transcript.get('partial', False),
+        'speech_ratio': (transcript.get('vad') or {}).get('speech_ratio'),
+        'linkedin_post': linkedin_post,
+        'post_variants': post_variants,  # {platform: text}
+        'image_url': image_url,  # Web URL for preview
+        'image_path': image_path,  # Local path for uploading
+        'video_title': video_title
+    }
+
+
+class EarlyGeneration:
+    """
+    Starts post text and image generation from the leading transcript
+
+    The image prompt only reads the first IMAGE_TRANSCRIPT_CHARS characters,
+    and without CONDENSE_TRANSCRIPT the post prompt only the first
+    POST_TRANSCRIPT_CHARS, so once that much transcript exists the prompts
+    are final. Generation then runs on threads while the rest of the video
+    is transcribed. A condensed post prompt depends on the whole transcript,
+    so with CONDENSE_TRANSCRIPT only the image starts early and the post
+    waits for it. finish() reuses the early results only if the final
+    transcript and title give identical prompts; otherwise it generates
+    again.
+    """
+
+    def __init__(self, regenerate=False, generate_image=True):
+        self.regenerate = regenerate
+        self.generate_image = generate_image
+        self.title = None
+        self.leading_text = ''
+        self._post = None   # (transcript, title, future) the post was started with
+        self._image = None  # (transcript, title, future, deadline) the image was started with
+
+    def on_progress(self, event, data):
+        if event == 'title':
+            self.title = data
+        elif event == 'segment':
+            self.leading_text += data['text']
+            self._start_ready()
+
+    def _start_ready(self):
+        text = self.leading_text
+        if self._image is None and self.generate_image and len(text) >= IMAGE_TRANSCRIPT_CHARS:
+            print(f"Starting image generation from the first {len(text)} transcript characters")
+            self._image = (text, self.title) + start_post_image(text, self.title, self.regenerate)
+        if self._post is None and not Config.CONDENSE_TRANSCRIPT and len(text) >= POST_TRANSCRIPT_CHARS:
+            print(f"Starting post generation from the first {len(text)} transcript characters")
+            self._post = (text, self.title, start_post_text(text, self.title, self.regenerate))
+
+    @staticmethod
+    def _matches(started, transcript, title, chars):
+        started_text, started_title = started[:2]
+        return started_title == title and started_text[:chars] == transcript[:chars]
+
+    @staticmethod
+    def _post_matches(started, transcript, title):
+        started_text, started_title = started[:2]
+        return started_title == title and prompt_transcript(started_text) == prompt_transcript(transcript)
+
+    def finish(self, transcript, video_title):
+        """The generate_linkedin_post() result for the final transcript, reusing early work where valid"""
+        if self._post and self._post_matches(self._post, transcript, video_title):
+            text_future = self._post[2]
+        else:
+            if self._post:
+                print("Post prompt changed after the leading transcript, generating the post again")
+            text_future = start_post_text(transcript, video_title, self.regenerate)
+
+        if self._image and self._matches(self._image, transcript, video_title, IMAGE_TRANSCRIPT_CHARS):
+            image_future, image_deadline = self._image[2:]
+        elif self.generate_image:
+            self._discard_image()
+            image_future, image_deadline = start_post_image(transcript, video_title, self.regenerate)
+        else:
+            image_future, image_deadline = None, None
+        self._post = self._image = None
+        return collect_generated_post(transcript, video_title, text_future, image_future, image_deadline)
+
+    def _discard_image(self):
+        if self._image:
+            discard_image_future(self._image[2])
+            self._image = None
+
+    def discard(self):
+        """Drop early results that will not be used"""
+        self._discard_image()
+        if self._post:
+            self._post[2].cancel()
+            self._post = None
+
+
+def estimate_audio_seconds(source, full_transcript=False):
+    """
+    Seconds of audio the job is expected to transcribe, used to schedule it
+
+    Uploads are probed; YouTube durations are unknown until the URL is
+    resolved, so they count as DEFAULT_JOB_AUDIO_SECONDS. Partial modes
+    only transcribe part of the recording.
+    """
+    duration = None
+    if source.get('file_path'):
+        duration = probe_duration(source['file_path'])
+    if duration is None:
+        duration = Config.DEFAULT_JOB_AUDIO_SECONDS
+
+    mode = Config.TRANSCRIBE_MODE
+    if full_transcript or mode not in PARTIAL_MODES:
+        return duration
+    if mode == 'sampled':
+        return min(duration, Config.SAMPLE_WINDOWS * Config.SAMPLE_WINDOW_SECONDS)
+    if Config.TRANSCRIPT_TIME_BUDGET:
+        duration = min(duration, Config.TRANSCRIPT_TIME_BUDGET)
+    if Config.TRANSCRIPT_CHAR_BUDGET:
+        duration = min(duration, Config.TRANSCRIPT_CHAR_BUDGET / SPOKEN_CHARS_PER_SECOND)
+    return duration
+
+
+def discard_source(source):
+    """Remove an uploaded file once the pipeline no longer needs it"""
+    if source.get('upload_id'):
+        discard_upload(source['upload_id'])
+    elif source.get('file_path'):
+        try:
+            os.unlink(source['file_path'])
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,88 @@
+"""Progress of the job a worker is running: stage transitions, percent complete and transcript segments"""
+import itertools
+from app import jobs
+
+STAGES = ('download', 'decode', 'transcribe', 'generate', 'image')
+
+# Per-job state; a worker process runs one job at a time
+_audio_seconds = None
+_last_percent = {}
+# In-process callbacks, called as callback(event, data) for 'title' and 'segment'
+_listeners = []
+# Numbers each post generation so the page can drop tokens from one it has moved past
+_post_generations = itertools.count(1)
+
+
+def reset():
+    """Forget the previous job's progress"""
+    global _audio_seconds
+    _audio_seconds = None
+    _last_percent.clear()
+
+
+def add_listener(callback):
+    _listeners.append(callback)
+
+
+def remove_listener(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def _notify(event, data):
+    for callback in list(_listeners):
+        callback(event, data)
+
+
+def report_title(title):
+    """The video's title, as soon as it is known (before transcription for YouTube)"""
+    _notify('title', title)
+
+
+def report_stage(stage, percent=None, **info):
+    """Tell the web process the job is in `stage`, `percent` done (sent on whole-percent changes only)"""
+    if percent is not None:
+        percent = max(0, min(100, int(percent)))
+        if _last_percent.get(stage) == percent:
+            return
+        _last_percent[stage] = percent
+    jobs.report('stage', dict(info, stage=stage, percent=percent))
+
+
+def start_transcription(audio_seconds=None):
+    """Enter the transcribe stage; segment end times against `audio_seconds` give the percent"""
+    global _audio_seconds
+    _audio_seconds = audio_seconds
+    report_stage('transcribe', 0, audio_seconds=audio_seconds)
+
+
+def report_segment(segment):
+    """Send one transcript segment as soon as the engine produces it"""
+    jobs.report('segment', {"start": segment["start"], "end": segment["end"], "text": segment["text"]})
+    _notify('segment', segment)
+    if _audio_seconds:
+        report_stage('transcribe', 100 * segment["end"] / _audio_seconds)
+
+
+def post_token_reporter():
+    """
+    on_token callback sending one generation's post text as the model writes it
+
+    Events carry the generation number, and `first` marks where its text
+    (re)starts, so the page shows the newest generation only.
+    """
+    generation = next(_post_generations)
+    
+    def report_token(text, first=False):
+        jobs.report('token', {"generation": generation, "text": text, "first": first})
+    return report_token
+
+
+def report_download(status):
+    """yt-dlp progress hook"""
+    if status.get('status') == 'downloading':
+        total = status.get('total_bytes') or status.get('total_bytes_estimate')
+        if total:
+            report_stage('download', 100 * status.get('downloaded_bytes', 0) / total)
+    elif status.get('status') == 'finished':
+        report_stage('download', 100)
@@ -0,0 +1,76 @@
+"""Per-platform renditions of a post image, rendered once and kept next to the original"""
+import os
+import tempfile
+from PIL import Image
+
+# Aspect ratios (width / height) each network shows uncropped in the feed, the
+# widest image worth uploading, and the JPEG quality to encode it at
+RENDITION_SPECS = {
+    'linkedin': {'min_aspect': 1 / 1.91, 'max_aspect': 1.91, 'max_width': 1200, 'quality': 85},
+    'facebook': {'min_aspect': 0.8, 'max_aspect': 1.91, 'max_width': 1200, 'quality': 85},
+    # Instagram rejects feed images outside 4:5 to 1.91:1 and only accepts JPEG
+    'instagram': {'min_aspect': 0.8, 'max_aspect': 1.91, 'max_width': 1080, 'quality': 88},
+}
+
+
+def rendition_path(image_path, platform):
+    """Where the `platform` rendition of `image_path` lives: beside it, e.g. post.png -> post.instagram.jpg"""
+    return f"{os.path.splitext(image_path)[0]}.{platform}.jpg"
+
+
+def _render(image_path, platform, output_path):
+    spec = RENDITION_SPECS[platform]
+    with Image.open(image_path) as image:
+        image = image.convert('RGB')
+        width, height = image.size
+        aspect = width / height
+        # Centre-crop only as much as needed to get inside the allowed range
+        if aspect > spec['max_aspect']:
+            new_width = round(height * spec['max_aspect'])
+            left = (width - new_width) // 2
+            image = image.crop((left, 0, left + new_width, height))
+        elif aspect < spec['min_aspect']:
+            new_height = round(width / spec['min_aspect'])
+            top = (height - new_height) // 2
+            image = image.crop((0, top, width, top + new_height))
+        if image.width > spec['max_width']:
+            image = image.resize((spec['max_width'], round(image.height * spec['max_width'] / image.width)),
+                                 Image.LANCZOS)
+
+        # Write to a temporary file first so a concurrent reader never sees half an image
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(output_path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                image.save(f, 'JPEG', quality=spec['quality'], optimize=True, progressive=True)
+            os.replace(tmp_path, output_path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+def platform_image(image_path, platform):
+    """
+    Path of the image to upload to `platform`
+
+    Renders the platform's rendition the first time it is asked for and
+    reuses it while it is newer than the original. Falls back to the
+    original if it cannot be rendered.
+    """
+    if not image_path or platform not in RENDITION_SPECS or not os.path.exists(image_path):
+        return image_path
+    output_path = rendition_path(image_path, platform)
+    try:
+        if os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(image_path):
+            return output_path
+        _render(image_path, platform, output_path)
+        print(f"🖼️ {platform} image: {os.path.getsize(image_path) // 1024} KB -> {os.path.getsize(output_path) // 1024} KB")
+        return output_path
+    except Exception as e:
+        print(f"⚠️ Could not render {platform} image, uploading the original: {e}")
+        return image_path
+
+
+def prepare_renditions(image_path):
+    """Render every platform's rendition ahead of publishing"""
+    for platform in RENDITION_SPECS:
+        platform_image(image_path, platform)
@@ -0,0 +1,217 @@
+"""Run the configured transcription engine over in-memory or streamed audio"""
+import numpy as np
+from app.config import Config
+from app.audio import decode_audio, stream_audio, probe_duration, quietest_point, WHISPER_SAMPLE_RATE
+from app.vad import detect_speech, compact_speech, to_original_time
+from app.transcription_engines import get_engine
+from app.progress import report_segment
+
+# How far back from the end of a streamed window to look for a pause to cut at
+STREAM_SEAM_SEARCH_SECONDS = 10
+# Small windows keep budget mode from transcribing far past the point it can stop
+BUDGET_WINDOW_SECONDS = 30
+# Above this speech ratio, compacting the audio saves too little to be worth the seams
+VAD_MAX_SPEECH_RATIO = 0.9
+
+
+def transcribe_audio(audio, offset=0.0, vad=None, model_size=None):
+    """
+    Transcribe a 16 kHz mono float32 array
+
+    `offset` (seconds) is added to every segment so callers working on a
+    slice of a longer recording get timestamps on the original timeline.
+    With `vad` (default Config.VAD_ENABLED) only detected speech regions are
+    sent to the model and segment times are mapped back afterwards.
+    `model_size` defaults to Config.WHISPER_MODEL_SIZE.
+    """
+    vad = Config.VAD_ENABLED if vad is None else vad
+    audio_seconds = len(audio) / WHISPER_SAMPLE_RATE
+    speech_seconds = audio_seconds
+    timeline = None
+
+    if vad:
+        regions = detect_speech(audio)
+        speech_seconds = sum(end - start for start, end in regions) / WHISPER_SAMPLE_RATE
+        if not regions:
+            return {"text": "", "segments": [], "language": None,
+                    "vad": {"audio_seconds": audio_seconds, "speech_seconds": 0.0}}
+        if speech_seconds < audio_seconds * VAD_MAX_SPEECH_RATIO:
+            audio, timeline = compact_speech(audio, regions)
+
+    def to_original(segment):
+        start, end = segment["start"], segment["end"]
+        if timeline:
+            start, end = to_original_time(start, timeline), to_original_time(end, timeline)
+        return {
+            "start": start + offset,
+            "end": end + offset,
+            "text": segment["text"]
+        }
+
+    result = get_engine().transcribe(audio, model_size, language=Config.TRANSCRIBE_LANGUAGE,
+                                     on_segment=lambda segment: report_segment(to_original(segment)))
+    segments = [to_original(segment) for segment in result.get("segments", [])]
+
+    return {
+        "text": result["text"],
+        "segments": segments,
+        "language": result.get("language"),
+        "vad": {"audio_seconds": audio_seconds, "speech_seconds": speech_seconds}
+    }
+
+
+def add_vad_stats(totals, result):
+    """Accumulate the audio/speech seconds of one transcribe_audio() call into `totals`"""
+    stats = result.get("vad")
+    if stats:
+        totals["audio_seconds"] = totals.get("audio_seconds", 0.0) + stats["audio_seconds"]
+        totals["speech_seconds"] = totals.get("speech_seconds", 0.0) + stats["speech_seconds"]
+    return totals
+
+
+def transcribe_windowed(audio, window_seconds=None, lead_seconds=None, model_size=None):
+    """
+    Transcribe an in-memory recording one window at a time
+
+    For engines that only return segments once a call finishes: each
+    window's segments (and the progress they drive) arrive as soon as that
+    window is done instead of after the whole recording. Windows are cut at
+    their quietest point near the end, like stream_transcribe(), so words
+    are not split at the seams. A shorter first window of `lead_seconds`
+    gets the leading transcript to early post generation sooner.
+    """
+    window = int((window_seconds or Config.STREAM_WINDOW_SECONDS) * WHISPER_SAMPLE_RATE)
+    search = int(STREAM_SEAM_SEARCH_SECONDS * WHISPER_SAMPLE_RATE)
+    window = max(window, 2 * search)
+    size = max(int(lead_seconds * WHISPER_SAMPLE_RATE), 2 * search) if lead_seconds else window
+    texts = []
+    segments = []
+    vad_stats = {}
+    language = None
+    start = 0
+    while start < len(audio):
+        end = start + size
+        # A short remainder goes with this window rather than becoming one of its own
+        end = len(audio) if end + search >= len(audio) else quietest_point(audio, end - search, end)
+        result = transcribe_audio(audio[start:end], offset=start / WHISPER_SAMPLE_RATE, model_size=model_size)
+        add_vad_stats(vad_stats, result)
+        texts.append(result["text"])
+        segments.extend(result["segments"])
+        language = language or result.get("language")
+        start = end
+        size = window
+
+    return {
+        "text": ''.join(texts),
+        "segments": segments,
+        "language": language,
+        "vad": vad_stats
+    }
+
+
+def stream_transcribe(file_path, window_seconds=None, vad_stats=None, model_size=None):
+    """
+    Yield transcript segments while reading audio from an ffmpeg pipe
+
+    Audio arrives in fixed windows. Each window is cut at its quietest point
+    near the end and the remainder is carried into the next one, so words
+    are not split at window seams. Memory stays bounded by one window plus
+    the carried tail, regardless of the recording's length.
+    Pass a dict as `vad_stats` to collect speech/audio seconds.
+    """
+    window_seconds = window_seconds or Config.STREAM_WINDOW_SECONDS
+    search = int(STREAM_SEAM_SEARCH_SECONDS * WHISPER_SAMPLE_RATE)
+    carry = np.zeros(0, dtype=np.float32)
+    consumed = 0  # samples already transcribed, i.e. the timeline offset of `carry`
+
+    for window in stream_audio(file_path, window_seconds):
+        buffer = np.concatenate([carry, window]) if len(carry) else window
+        if len(buffer) <= search:
+            carry = buffer
+            continue
+
+        cut = quietest_point(buffer, len(buffer) - search, len(buffer))
+        result = transcribe_audio(buffer[:cut], offset=consumed / WHISPER_SAMPLE_RATE, model_size=model_size)
+        if vad_stats is not None:
+            add_vad_stats(vad_stats, result)
+        for segment in result["segments"]:
+            yield segment
+        consumed += cut
+        carry = buffer[cut:].copy()
+
+    if len(carry):
+        result = transcribe_audio(carry, offset=consumed / WHISPER_SAMPLE_RATE, model_size=model_size)
+        if vad_stats is not None:
+            add_vad_stats(vad_stats, result)
+        for segment in result["segments"]:
+            yield segment
+
+
+def transcribe_budget(file_path, char_budget=None, time_budget=None, model_size=None):
+    """
+    Transcribe from the start of the recording until a budget is met
+
+    Stops decoding as soon as `char_budget` characters of text exist or
+    `time_budget` seconds of audio have been covered (0 disables a budget).
+    """
+    char_budget = Config.TRANSCRIPT_CHAR_BUDGET if char_budget is None else char_budget
+    time_budget = Config.TRANSCRIPT_TIME_BUDGET if time_budget is None else time_budget
+
+    segments = []
+    chars = 0
+    vad_stats = {}
+    stream = stream_transcribe(file_path, window_seconds=BUDGET_WINDOW_SECONDS, vad_stats=vad_stats,
+                               model_size=model_size)
+    try:
+        for segment in stream:
+            segments.append(segment)
+            chars += len(segment["text"])
+            if (char_budget and chars >= char_budget) or (time_budget and segment["end"] >= time_budget):
+                break
+    finally:
+        stream.close()
+
+    covered = segments[-1]["end"] if segments else 0.0
+    return {
+        "text": ''.join(segment["text"] for segment in segments),
+        "segments": segments,
+        "coverage": {"transcribed_seconds": covered, "duration": probe_duration(file_path)},
+        "vad": vad_stats
+    }
+
+
+def transcribe_sampled(file_path, windows=None, window_seconds=None, model_size=None):
+    """
+    Transcribe a few windows spread evenly across the recording
+
+    Gives the generator a view of the whole video for a fixed cost. Falls
+    back to a full pass when the recording is shorter than the sample.
+    """
+    windows = windows or Config.SAMPLE_WINDOWS
+    window_seconds = window_seconds or Config.SAMPLE_WINDOW_SECONDS
+    duration = probe_duration(file_path)
+
+    if not duration or duration <= windows * window_seconds:
+        result = transcribe_audio(decode_audio(file_path), model_size=model_size)
+        result["coverage"] = {"transcribed_seconds": duration, "duration": duration}
+        return result
+
+    segments = []
+    texts = []
+    vad_stats = {}
+    stride = duration / windows
+    for i in range(windows):
+        start = min(max(0.0, stride * (i + 0.5) - window_seconds / 2), duration - window_seconds)
+        audio = decode_audio(file_path, start=start, duration=window_seconds)
+        result = transcribe_audio(audio, offset=start, model_size=model_size)
+        add_vad_stats(vad_stats, result)
+        segments.extend(result["segments"])
+        texts.append(result["text"].strip())
+
+    return {
+        # Mark the gaps between sampled windows so the text is not read as continuous
+        "text": ' ... '.join(text for text in texts if text),
+        "segments": segments,
+        "coverage": {"transcribed_seconds": windows * window_seconds, "duration": duration},
+        "vad": vad_stats
+    }
@@ -0,0 +1,79 @@
+"""Content-addressed transcript cache for uploads and YouTube videos"""
+import hashlib
+import re
+from urllib.parse import urlparse, parse_qs
+from app.config import Config
+from app.disk_cache import DiskCache
+
+_YOUTUBE_ID = re.compile(r'^[A-Za-z0-9_-]{11}$')
+
+_cache = None
+
+
+def get_transcript_cache():
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(Config.TRANSCRIPT_CACHE_DIR, Config.TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024)
+    return _cache
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's bytes, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def youtube_video_id(url):
+    """Canonical 11-character video ID for the common YouTube URL shapes, or None"""
+    parsed = urlparse(url)
+    host = (parsed.hostname or '').lower()
+    path_parts = [part for part in parsed.path.split('/') if part]
+
+    candidate = None
+    if host.endswith('youtu.be') and path_parts:
+        candidate = path_parts[0]
+    elif host.endswith('youtube.com') or host.endswith('youtube-nocookie.com'):
+        if path_parts[:1] == ['watch']:
+            candidate = parse_qs(parsed.query).get('v', [None])[0]
+        elif len(path_parts) >= 2 and path_parts[0] in ('shorts', 'embed', 'live', 'v'):
+            candidate = path_parts[1]
+
+    if candidate and _YOUTUBE_ID.match(candidate):
+        return candidate
+    return None
+
+
+def transcript_cache_key(kind, identifier, mode_signature, model_size=None):
+    """
+    Cache key for a transcript
+
+    `kind` is "file" (identifier = SHA-256 of the bytes) or "youtube"
+    (identifier = video ID). The engine, model size and transcription mode
+    are part of the key so a partial or lower-quality transcript never
+    answers a request for a different one.
+    """
+    return f"{kind}:{identifier}:{transcript_variant(mode_signature, model_size)}"
+
+
+def transcript_variant(mode_signature, model_size=None):
+    """The engine/model/mode part of a cache key; transcripts are only interchangeable within one variant"""
+    return f"{Config.TRANSCRIBE_ENGINE}-{model_size or Config.WHISPER_MODEL_SIZE}:{mode_signature}"
+
+
+def get_cached_transcript(key, count=True):
+    return get_transcript_cache().get_json(key, count)
+
+
+def record_transcript_lookup(hit):
+    get_transcript_cache().record_lookup(hit)
+
+
+def store_transcript(key, transcript):
+    get_transcript_cache().set_json(key, transcript)
+
+
+def transcript_cache_stats(other_counters=()):
+    return get_transcript_cache().stats(other_counters)
@@ -0,0 +1,136 @@
+"""Pluggable speech-to-text engines and duration/load based model tiering"""
+from app.config import Config
+from app.whisper_models import acquire_model
+
+# Smallest to largest; tiering only ever moves along this order
+MODEL_SIZE_ORDER = ['tiny', 'base', 'small', 'medium', 'large-v1', 'large-v2', 'large-v3', 'large']
+
+
+class TranscriptionEngine:
+    """
+    Turns 16 kHz mono float32 audio into {"text", "segments", "language"}
+
+    `on_segment` is called with each segment as soon as the engine has it.
+    Engines with `streams_segments` False only have segments once the whole
+    call finishes, so callers wanting live segments feed them shorter audio.
+    """
+
+    name = None
+    streams_segments = True
+
+    def transcribe(self, audio, model_size=None, language=None, on_segment=None):
+        raise NotImplementedError
+
+
+class WhisperEngine(TranscriptionEngine):
+    """Reference openai-whisper implementation (PyTorch, fp32 on CPU)"""
+
+    name = 'whisper'
+    streams_segments = False
+
+    def transcribe(self, audio, model_size=None, language=None, on_segment=None):
+        with acquire_model(model_size, self.name) as model:
+            result = model.transcribe(audio, language=language or None)
+
+        # openai-whisper only returns segments once the whole array is decoded
+        segments = [
+            {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+            for segment in result.get("segments", [])
+        ]
+        if on_segment:
+            for segment in segments:
+                on_segment(segment)
+
+        return {
+            "text": result["text"],
+            "segments": segments,
+            "language": result.get("language")
+        }
+
+
+class FasterWhisperEngine(TranscriptionEngine):
+    """CTranslate2 implementation with int8 weights, several times faster on CPU"""
+
+    name = 'faster-whisper'
+
+    def transcribe(self, audio, model_size=None, language=None, on_segment=None):
+        with acquire_model(model_size, self.name) as model:
+            segments_iter, info = model.transcribe(audio, language=language or None)
+            # Decoding is lazy; consume the generator while holding the model
+            segments = []
+            for segment in segments_iter:
+                segments.append({"start": segment.start, "end": segment.end, "text": segment.text})
+                if on_segment:
+                    on_segment(segments[-1])
+
+        return {
+            "text": ''.join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": info.language
+        }
+
+
+ENGINES = {
+    WhisperEngine.name: WhisperEngine(),
+    FasterWhisperEngine.name: FasterWhisperEngine(),
+}
+
+
+def get_engine(name=None):
+    name = name or Config.TRANSCRIBE_ENGINE
+    if name not in ENGINES:
+        raise Exception(f"Unknown transcription engine: {name} (available: {', '.join(ENGINES)})")
+    return ENGINES[name]
+
+
+def size_rank(size):
+    return MODEL_SIZE_ORDER.index(size) if size in MODEL_SIZE_ORDER else -1
+
+
+def parse_model_tiers(spec=None):
+    """
+    Parse MODEL_TIERS, e.g. "600:small,1800:base,0:tiny"
+
+    Each entry is max_duration_seconds:model_size, checked in order; 0 means
+    no limit. Returns a list of (max_seconds, size) tuples.
+    """
+    spec = Config.MODEL_TIERS if spec is None else spec
+    tiers = []
+    for entry in spec.split(','):
+        if ':' not in entry:
+            continue
+        max_seconds, size = entry.split(':', 1)
+        tiers.append((float(max_seconds), size.strip()))
+    return tiers
+
+
+def configured_model_sizes():
+    """Every model size this deployment may use, largest first"""
+    sizes = {Config.WHISPER_MODEL_SIZE} | {size for _, size in parse_model_tiers()}
+    return sorted(sizes, key=size_rank, reverse=True)
+
+
+def select_model_size(duration_seconds=None, queue_depth=0):
+    """
+    Pick a model size for a recording of `duration_seconds`
+
+    Longer recordings get smaller models per MODEL_TIERS, and every
+    TIER_QUEUE_STEP jobs already waiting or running drop one more tier, so
+    throughput holds up at peak load. Without tiers (or a known duration)
+    the default WHISPER_MODEL_SIZE is used.
+    """
+    tiers = parse_model_tiers()
+    if not tiers or duration_seconds is None:
+        return Config.WHISPER_MODEL_SIZE
+
+    size = tiers[-1][1]
+    for max_seconds, tier_size in tiers:
+        if not max_seconds or duration_seconds <= max_seconds:
+            size = tier_size
+            break
+
+    steps_down = queue_depth // Config.TIER_QUEUE_STEP if Config.TIER_QUEUE_STEP else 0
+    if steps_down:
+        ladder = sorted({tier_size for _, tier_size in tiers}, key=size_rank)
+        size = ladder[max(0, ladder.index(size) - steps_down)]
+    return size
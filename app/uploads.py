@@ -0,0 +1,261 @@
+"""Single-write upload ingestion with hashing on the fly and resumable chunked uploads"""
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from app.config import Config
+from app.exceptions import UploadException, UploadTooLargeException
+from app.transcript_cache import file_sha256
+
+# Incremental hashes of in-progress chunked uploads, keyed by upload id.
+# Lost on restart; complete_upload() then re-hashes the file from disk.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def max_upload_bytes():
+    return Config.MAX_UPLOAD_MB * 1024 * 1024
+
+
+def _partial_dir():
+    path = os.path.join(Config.UPLOAD_FOLDER, 'partial')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _meta_path(upload_id):
+    return os.path.join(_partial_dir(), f"{upload_id}.json")
+
+
+def _data_path(upload_id):
+    return os.path.join(_partial_dir(), f"{upload_id}.part")
+
+
+def _extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+def _check_upload_id(upload_id):
+    try:
+        uuid.UUID(hex=upload_id)
+    except ValueError:
+        raise UploadException("Unknown upload", 404)
+
+
+def _read_meta(upload_id):
+    _check_upload_id(upload_id)
+    try:
+        with open(_meta_path(upload_id)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        raise UploadException("Unknown upload", 404)
+
+
+def _write_meta(upload_id, meta):
+    tmp_path = _meta_path(upload_id) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, _meta_path(upload_id))
+
+
+def check_declared_size(size):
+    """Reject an upload from its declared size before any bytes are read"""
+    if size is not None and size > max_upload_bytes():
+        raise UploadTooLargeException(max_upload_bytes())
+
+
+async def save_stream(byte_stream, filename, declared_size=None):
+    """
+    Write an async stream of bytes straight to the uploads folder
+
+    The SHA-256 is computed as bytes arrive and the size cap is enforced
+    both on the declared size and while receiving. Returns
+    (path, sha256, size).
+    """
+    check_declared_size(declared_size)
+    path = os.path.join(Config.UPLOAD_FOLDER, f"{uuid.uuid4().hex}.{_extension(filename)}")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, 'wb') as f:
+            async for chunk in byte_stream:
+                size += len(chunk)
+                if size > max_upload_bytes():
+                    raise UploadTooLargeException(max_upload_bytes())
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest(), size
+
+
+def cleanup_expired_uploads():
+    """
+    Delete uploads older than UPLOAD_EXPIRY_HOURS that no job will process
+
+    That is unfinished chunked uploads, and completed ones that were never
+    handed to a job (claimed uploads are removed by the job itself).
+    """
+    cutoff = time.time() - Config.UPLOAD_EXPIRY_HOURS * 3600
+    for entry in os.scandir(_partial_dir()):
+        if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff:
+            upload_id = entry.name[:-len('.json')]
+            try:
+                with open(entry.path) as f:
+                    meta = json.load(f)
+            except (FileNotFoundError, ValueError):
+                meta = {}
+            if meta.get('claimed'):
+                continue
+            for path in (meta.get('path'), _data_path(upload_id), entry.path):
+                if path:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+            with _hashers_lock:
+                _hashers.pop(upload_id, None)
+
+
+def create_upload(filename, size):
+    """Start a resumable upload of `size` bytes; returns its id"""
+    if _extension(filename) not in Config.ALLOWED_EXTENSIONS:
+        raise UploadException("Invalid file type")
+    if size <= 0:
+        raise UploadException("Upload size must be positive")
+    check_declared_size(size)
+    cleanup_expired_uploads()
+
+    upload_id = uuid.uuid4().hex
+    open(_data_path(upload_id), 'wb').close()
+    _write_meta(upload_id, {
+        'filename': filename,
+        'size': size,
+        'created': time.time(),
+        'complete': False,
+    })
+    with _hashers_lock:
+        _hashers[upload_id] = (hashlib.sha256(), 0)
+    return upload_id
+
+
+def upload_status(upload_id):
+    """How many bytes of the upload the server already has"""
+    meta = _read_meta(upload_id)
+    received = meta['size'] if meta['complete'] else os.path.getsize(_data_path(upload_id))
+    return {
+        'upload_id': upload_id,
+        'size': meta['size'],
+        'received': received,
+        'complete': meta['complete'],
+    }
+
+
+async def append_chunk(upload_id, offset, byte_stream):
+    """
+    Append bytes at `offset` to a resumable upload
+
+    `offset` must equal the number of bytes already received, so a client
+    that lost its connection asks upload_status() and resumes from there.
+    The data file is locked from the offset check to the last write, so a
+    second PUT for the same upload (a retry racing the original, or another
+    server worker) gets a 409 instead of appending the same bytes again.
+    """
+    meta = _read_meta(upload_id)
+    if meta['complete']:
+        raise UploadException("Upload already completed", 409)
+    try:
+        f = open(_data_path(upload_id), 'ab')
+    except FileNotFoundError:
+        raise UploadException("Upload already completed", 409)
+
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadException("Another chunk of this upload is still being received", 409)
+        received = os.fstat(f.fileno()).st_size
+        if offset != received:
+            raise UploadException(f"Expected offset {received}", 409)
+
+        with _hashers_lock:
+            hasher, hashed = _hashers.get(upload_id, (None, 0))
+        # A hash that does not cover exactly the bytes on disk is useless; rebuild at completion
+        if hasher is not None and hashed != received:
+            hasher = None
+
+        try:
+            async for chunk in byte_stream:
+                if received + len(chunk) > meta['size']:
+                    raise UploadException("Chunk runs past the declared upload size")
+                f.write(chunk)
+                received += len(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+        finally:
+            # Keep whatever arrived before a dropped connection; the client resumes after it
+            f.flush()
+            with _hashers_lock:
+                _hashers[upload_id] = (hasher, received) if hasher is not None else (None, 0)
+        # Closing the file releases the lock
+
+    # Touch the metadata so active uploads do not expire
+    os.utime(_meta_path(upload_id))
+    return received
+
+
+def complete_upload(upload_id):
+    """Move a fully received upload into the uploads folder; returns (path, sha256, size)"""
+    meta = _read_meta(upload_id)
+    if meta['complete']:
+        return meta['path'], meta['sha256'], meta['size']
+
+    data_path = _data_path(upload_id)
+    received = os.path.getsize(data_path)
+    if received != meta['size']:
+        raise UploadException(f"Upload incomplete: {received} of {meta['size']} bytes received", 409)
+
+    with _hashers_lock:
+        hasher, hashed = _hashers.pop(upload_id, (None, 0))
+    sha256 = hasher.hexdigest() if hasher is not None and hashed == received else file_sha256(data_path)
+
+    path = os.path.join(Config.UPLOAD_FOLDER, f"{upload_id}.{_extension(meta['filename'])}")
+    os.replace(data_path, path)
+    meta.update({'complete': True, 'path': path, 'sha256': sha256})
+    _write_meta(upload_id, meta)
+    return path, sha256, meta['size']
+
+
+def completed_upload(upload_id):
+    """
+    (path, sha256, filename) of a completed upload, for handing it to processing
+
+    Marks the upload as claimed, so cleanup_expired_uploads() leaves it to
+    the job; the pipeline removes it with discard_upload().
+    """
+    meta = _read_meta(upload_id)
+    if not meta['complete'] or not os.path.exists(meta['path']):
+        raise UploadException("Upload is not complete", 409)
+    if not meta.get('claimed'):
+        meta['claimed'] = True
+        _write_meta(upload_id, meta)
+    return meta['path'], meta['sha256'], meta['filename']
+
+
+def discard_upload(upload_id):
+    """Remove a completed upload's file and metadata once it has been processed"""
+    _check_upload_id(upload_id)
+    try:
+        meta = _read_meta(upload_id)
+    except UploadException:
+        return
+    for path in (meta.get('path'), _data_path(upload_id), _meta_path(upload_id)):
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
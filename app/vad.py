@@ -0,0 +1,144 @@
+"""Energy-based voice activity detection used to skip silence and music before Whisper"""
+import numpy as np
+from app.config import Config
+from app.audio import WHISPER_SAMPLE_RATE
+
+VAD_FRAME_MS = 30
+VAD_BLOCK_FRAMES = 8192
+SPEECH_BAND_HZ = (300, 3400)
+# Regions closer than this are merged, shorter ones dropped, and every region padded
+MERGE_GAP_SECONDS = 0.5
+MIN_REGION_SECONDS = 0.25
+PAD_SECONDS = 0.2
+# Silence inserted between kept regions so Whisper still sees a pause there
+JOIN_GAP_SECONDS = 0.3
+# Recordings with less loudness spread than this have no detectable pauses; they are kept
+# whole or dropped whole
+MIN_DYNAMIC_RANGE_DB = 6.0
+
+
+def _frame_features(audio, frame):
+    """Per-frame loudness in dB, RMS level in dBFS and the share of energy in the speech band"""
+    n_frames = len(audio) // frame
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    freqs = np.fft.rfftfreq(frame, 1.0 / WHISPER_SAMPLE_RATE)
+    band = (freqs >= SPEECH_BAND_HZ[0]) & (freqs <= SPEECH_BAND_HZ[1])
+
+    loudness = np.empty(n_frames, dtype=np.float32)
+    level = np.empty(n_frames, dtype=np.float32)
+    band_ratio = np.empty(n_frames, dtype=np.float32)
+    for start in range(0, n_frames, VAD_BLOCK_FRAMES):
+        block = frames[start:start + VAD_BLOCK_FRAMES]
+        power = np.abs(np.fft.rfft(block, axis=1)) ** 2
+        total = power.sum(axis=1) + 1e-10
+        loudness[start:start + len(power)] = 10 * np.log10(total / frame)
+        level[start:start + len(power)] = 10 * np.log10(np.mean(block * block, axis=1) + 1e-12)
+        band_ratio[start:start + len(power)] = power[:, band].sum(axis=1) / total
+    return loudness, level, band_ratio
+
+
+def _local_std(values, width):
+    """Standard deviation of `values` over a centred moving window"""
+    kernel = np.ones(width) / width
+    mean = np.convolve(values, kernel, mode='same')
+    mean_sq = np.convolve(values * values, kernel, mode='same')
+    return np.sqrt(np.maximum(mean_sq - mean * mean, 0))
+
+
+def _runs(mask):
+    """(start, end) frame index pairs of consecutive True values"""
+    padded = np.concatenate([[False], mask, [False]])
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def detect_speech(audio):
+    """
+    Sample ranges of 16 kHz audio that likely contain speech
+
+    A frame counts as speech when it is above VAD_SILENCE_DBFS, loud
+    relative to the recording's own noise floor, most of its energy is in
+    the speech band, and loudness around it fluctuates at a syllabic rate
+    (sustained music is flatter). Audio with too little loudness spread to
+    find pauses in is kept whole only if it is mostly speech-like by those
+    last two measures; steady tones, room noise and digital silence give [].
+    """
+    frame = WHISPER_SAMPLE_RATE * VAD_FRAME_MS // 1000
+    if len(audio) < frame:
+        return [(0, len(audio))] if len(audio) else []
+
+    loudness, level, band_ratio = _frame_features(audio, frame)
+    audible = level > Config.VAD_SILENCE_DBFS
+    if not audible.any():
+        return []
+
+    modulation = _local_std(loudness, max(1, 1000 // VAD_FRAME_MS))
+    in_band = audible & (band_ratio > Config.VAD_MIN_BAND_RATIO)
+    floor, peak = np.percentile(loudness, [10, 90])
+    if peak - floor < MIN_DYNAMIC_RANGE_DB:
+        # Speech without pauses still fluctuates; a tone or room noise barely does
+        fluctuating = modulation > Config.VAD_MIN_MODULATION_DB / 2
+        return [(0, len(audio))] if (in_band & fluctuating).mean() >= 0.5 else []
+
+    threshold = floor + Config.VAD_THRESHOLD * (peak - floor)
+    speech = (loudness > threshold) & in_band & (modulation > Config.VAD_MIN_MODULATION_DB)
+
+    frames_per_second = 1000 / VAD_FRAME_MS
+    merge_gap = int(MERGE_GAP_SECONDS * frames_per_second)
+    min_region = int(MIN_REGION_SECONDS * frames_per_second)
+    pad = int(PAD_SECONDS * frames_per_second)
+
+    merged = []
+    for start, end in _runs(speech):
+        if merged and start - merged[-1][1] <= merge_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    regions = []
+    for start, end in merged:
+        if end - start < min_region:
+            continue
+        start = int(max(0, start - pad) * frame)
+        end = int(min(len(loudness), end + pad) * frame)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    if regions and len(audio) - regions[-1][1] < frame:
+        regions[-1] = (regions[-1][0], len(audio))
+    return regions
+
+
+def compact_speech(audio, regions):
+    """
+    Concatenate speech regions with short silences between them
+
+    Returns the compacted audio and a timeline map of
+    (compact_start, original_start, length) tuples in seconds.
+    """
+    gap = np.zeros(int(JOIN_GAP_SECONDS * WHISPER_SAMPLE_RATE), dtype=np.float32)
+    pieces = []
+    timeline = []
+    position = 0
+    for start, end in regions:
+        if pieces:
+            pieces.append(gap)
+            position += len(gap)
+        pieces.append(audio[start:end])
+        timeline.append((position / WHISPER_SAMPLE_RATE, start / WHISPER_SAMPLE_RATE,
+                         (end - start) / WHISPER_SAMPLE_RATE))
+        position += end - start
+    compacted = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+    return compacted, timeline
+
+
+def to_original_time(seconds, timeline):
+    """Map a time on the compacted audio back onto the original recording"""
+    if not timeline:
+        return seconds
+    compact_starts = [entry[0] for entry in timeline]
+    index = max(0, int(np.searchsorted(compact_starts, seconds, side='right')) - 1)
+    compact_start, original_start, length = timeline[index]
+    # Times inside an inserted gap clamp to the end of the region before it
+    return original_start + min(max(seconds - compact_start, 0.0), length)
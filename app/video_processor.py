@@ -1,23 +1,189 @@
 import os
-import whisper
+import threading
 import yt_dlp
 import tempfile
+from app.config import Config
+from app.audio import decode_audio, probe_duration, WHISPER_SAMPLE_RATE
+from app.captions import fetch_caption_transcript
+from app.transcriber import transcribe_audio, transcribe_windowed, stream_transcribe, transcribe_budget, transcribe_sampled
+from app.parallel_transcription import transcribe_parallel
+from app.transcript_cache import (
+    file_sha256, youtube_video_id, transcript_cache_key, transcript_variant,
+    get_cached_transcript, store_transcript, record_transcript_lookup
+)
+from app.fingerprint import compute_fingerprint, get_fingerprint_index, align_transcript, frames_to_seconds
+from app.transcription_engines import get_engine, select_model_size, configured_model_sizes, size_rank
+from app.progress import report_stage, report_download, report_title, start_transcription
 
-def extract_transcript(video_source):
-    if video_source.startswith('http'):
-        return extract_from_youtube(video_source)
+# Whisper only needs speech, so take the smallest audio-only stream that is still
+# intelligible and fall back to progressively larger formats.
+YOUTUBE_AUDIO_FORMAT = 'worstaudio[abr>=32]/worstaudio/bestaudio/worst'
+YOUTUBE_VIDEO_FORMAT = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
+
+# Modes that deliberately transcribe only part of the recording
+PARTIAL_MODES = ('budget', 'sampled')
+
+# Transcriptions running in this process; stands in for queue depth when tiering
+_active_lock = threading.Lock()
+_active_transcriptions = 0
+
+def extract_transcript(video_source, full_transcript=False, content_hash=None, queue_depth=None):
+    """
+    Transcribe a YouTube URL or local file, reusing a cached transcript when possible
+
+    `content_hash` is the SHA-256 of an uploaded file when the caller has
+    already computed it; otherwise it is computed here. `queue_depth` is the
+    number of other jobs waiting or running, used for model tiering; it
+    defaults to the transcriptions currently running in this process.
+    """
+    mode = Config.TRANSCRIBE_MODE
+    if full_transcript and mode in PARTIAL_MODES:
+        mode = 'full'
+    is_youtube = video_source.startswith('http')
+    if queue_depth is None:
+        queue_depth = _active_transcriptions
+    
+    # A YouTube video's duration is only known once the URL is resolved, so its
+    # model size is picked inside extract_from_youtube
+    model_size = None
+    if not is_youtube:
+        duration = probe_duration(video_source) if Config.MODEL_TIERS else None
+        model_size = select_model_size(duration, queue_depth)
+    
+    cache_id = _transcript_cache_id(video_source, content_hash)
+    if cache_id:
+        cache_key, cached = _lookup_cached_transcript(cache_id, mode, model_size)
+        if cached:
+            print(f"✅ Transcript cache hit ({cache_key})")
+            report_stage('transcribe', 100, cached=True)
+            cached['cached'] = True
+            return cached
+        print(f"Transcript cache miss ({cache_id[0]}:{cache_id[1]})")
+    
+    # Re-encoded or trimmed copies of an earlier upload miss the byte hash but
+    # still sound the same; look them up by acoustic fingerprint
+    fingerprint = None
+    dedup = None
+    variant = transcript_variant(_mode_signature(mode), model_size)
+    if cache_id and Config.FINGERPRINT_ENABLED and not is_youtube:
+        fingerprint, dedup, transcript = _find_fingerprint_match(video_source, variant)
+        if transcript:
+            store_transcript(transcript_cache_key(*cache_id, _mode_signature(mode), model_size), transcript)
+            report_stage('transcribe', 100, cached=True)
+            transcript['cached'] = True
+            transcript['dedup'] = dedup
+            return transcript
+    
+    _track_active(1)
+    try:
+        if is_youtube:
+            transcript = extract_from_youtube(video_source, mode=mode, queue_depth=queue_depth)
+        else:
+            transcript = extract_from_file(video_source, mode=mode, model_size=model_size)
+    finally:
+        _track_active(-1)
+    
+    if cache_id:
+        cache_key = transcript_cache_key(*cache_id, _mode_signature(mode), transcript.get('model_size') or 'captions')
+        store_transcript(cache_key, transcript)
+        if fingerprint is not None and len(fingerprint):
+            get_fingerprint_index().add(fingerprint, cache_key, variant)
+    transcript['cached'] = False
+    if dedup:
+        transcript['dedup'] = dedup
+    return transcript
+
+def _track_active(delta):
+    global _active_transcriptions
+    with _active_lock:
+        _active_transcriptions += delta
+
+def _lookup_cached_transcript(cache_id, mode, model_size):
+    """
+    Find a cached transcript at least as good as `model_size` would produce
+
+    Transcripts from larger models (or, for YouTube, captions) are accepted
+    too. With `model_size` None every configured size is tried.
+    """
+    signature = _mode_signature(mode)
+    sizes = configured_model_sizes()
+    if model_size is None:
+        sizes = ['captions'] + sizes
     else:
-        return extract_from_file(video_source)
+        sizes = [size for size in sizes if size_rank(size) >= size_rank(model_size)] or [model_size]
+    
+    # Probing each size is one lookup as far as the hit rate is concerned
+    for size in sizes:
+        key = transcript_cache_key(*cache_id, signature, size)
+        cached = get_cached_transcript(key, count=False)
+        if cached:
+            record_transcript_lookup(True)
+            return key, cached
+    record_transcript_lookup(False)
+    return None, None
 
-def extract_from_youtube(url):
+def _find_fingerprint_match(file_path, variant):
+    """
+    Fingerprint an upload and look for a near-identical earlier one
+
+    Returns (fingerprint, decision, transcript); transcript is the earlier
+    upload's transcript aligned to this file, or None when there is no match.
+    """
+    try:
+        fingerprint = compute_fingerprint(file_path)
+        decision = get_fingerprint_index().find_match(fingerprint, variant)
+    except Exception as e:
+        print(f"⚠️ Fingerprinting failed, skipping dedup: {str(e)}")
+        return None, None, None
+    
+    if decision.get('entry_id'):
+        verdict = 'match' if decision['matched'] else 'no match'
+        print(f"Fingerprint {verdict}: ber={decision['ber']} (max {decision['max_ber']}), "
+              f"coverage={decision['coverage']} (min {decision['min_coverage']}), "
+              f"offset={decision['offset_seconds']}s, candidates={decision['candidates']}")
+    else:
+        print(f"Fingerprint no match: no aligned candidate among {decision['candidates']} stored uploads")
+    
+    if not decision['matched']:
+        return fingerprint, decision, None
+    
+    stored = get_cached_transcript(decision['transcript_key'])
+    if not stored:
+        print("Matched upload's transcript has been evicted, transcribing")
+        decision['matched'] = False
+        decision['reason'] = 'transcript evicted'
+        return fingerprint, decision, None
+    
+    duration = frames_to_seconds(len(fingerprint))
+    return fingerprint, decision, align_transcript(stored, decision['offset_seconds'], duration)
+
+def _mode_signature(mode):
+    """Transcription mode plus the settings that change what a partial mode produces"""
+    if mode == 'budget':
+        return f"budget-{Config.TRANSCRIPT_CHAR_BUDGET}c-{Config.TRANSCRIPT_TIME_BUDGET}s"
+    if mode == 'sampled':
+        return f"sampled-{Config.SAMPLE_WINDOWS}x{Config.SAMPLE_WINDOW_SECONDS}s"
+    # Every other mode produces a transcript of the whole recording
+    return 'full'
+
+def _transcript_cache_id(video_source, content_hash=None):
+    """(kind, identifier) naming the recording in the transcript cache, or None"""
+    if not Config.TRANSCRIPT_CACHE_ENABLED:
+        return None
+    if video_source.startswith('http'):
+        video_id = youtube_video_id(video_source)
+        return ('youtube', video_id) if video_id else None
+    return ('file', content_hash or file_sha256(video_source))
+
+def extract_from_youtube(url, mode=None, queue_depth=0):
     try:
         print(f"Processing YouTube URL: {url}")
         
         with tempfile.TemporaryDirectory() as temp_dir:
             # Configure yt-dlp options based on your working example
             ydl_opts = {
-                'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-                'outtmpl': f'{temp_dir}/%(title)s.%(ext)s',
+                'format': YOUTUBE_AUDIO_FORMAT if Config.YOUTUBE_AUDIO_ONLY else YOUTUBE_VIDEO_FORMAT,
+                'outtmpl': f'{temp_dir}/%(id)s.%(ext)s',
                 # Use specific client to bypass "Precondition check failed"
                 'extractor_args': {
                     'youtube': {
@@ -26,36 +192,46 @@ def extract_from_youtube(url):
                 },
                 'verbose': False,  # Set to True for debugging
                 'quiet': True,     # Reduce output noise
+                'progress_hooks': [report_download],
             }
             
             print(f"Attempting download to: {temp_dir}")
             
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Extract info first to get video details
+                # Resolve the URL once; the info dict is reused for captions and download
                 info = ydl.extract_info(url, download=False)
                 video_title = info.get('title', 'Unknown')
                 video_duration = info.get('duration', 0)
                 
                 print(f"Video title: {video_title}")
+                report_title(video_title)
                 print(f"Video duration: {video_duration} seconds")
                 
-                # Download the video
-                ydl.download([url])
+                # Existing subtitles are far cheaper than running Whisper
+                if Config.YOUTUBE_CAPTIONS:
+                    transcript = _try_captions(ydl, info)
+                    if transcript:
+                        report_stage('transcribe', 100, captions=True)
+                        transcript['title'] = video_title
+                        transcript['thumbnail'] = info.get('thumbnail')
+                        return transcript
+                
+                # Download the already-selected format without resolving the URL again
+                report_stage('download', 0)
+                info = ydl.process_ie_result(info, download=True)
             
-            # Find the downloaded file
-            downloaded_files = [f for f in os.listdir(temp_dir) if f.endswith(('.mp4', '.webm', '.mkv'))]
-            if not downloaded_files:
-                raise ValueError("No video file was downloaded")
+            model_size = select_model_size(video_duration or None, queue_depth)
             
-            downloaded_file = os.path.join(temp_dir, downloaded_files[0])
-            print(f"Downloaded file: {downloaded_file}")
+            downloaded_file = _downloaded_path(info, temp_dir)
+            print(f"Downloaded file: {downloaded_file} ({os.path.getsize(downloaded_file) / 1e6:.1f} MB)")
             
             # Extract transcript from downloaded file
-            transcript = extract_from_file(downloaded_file)
+            transcript = extract_from_file(downloaded_file, mode=mode, model_size=model_size)
             print("Transcript extraction completed")
             
             # Add video title to transcript result
             transcript['title'] = video_title
+            transcript['thumbnail'] = info.get('thumbnail')
             
             return transcript
                 
@@ -67,31 +243,134 @@ def extract_from_youtube(url):
         print("3. Try a different YouTube URL")
         raise Exception(f"YouTube extraction failed: {str(e)}")
 
-def extract_from_file(file_path):
+def _try_captions(ydl, info):
+    """Return a transcript built from the video's subtitle track, or None"""
+    languages = [lang.strip() for lang in Config.CAPTION_LANGUAGES.split(',') if lang.strip()]
+    try:
+        transcript = fetch_caption_transcript(ydl, info, languages)
+    except Exception as e:
+        print(f"⚠️ Could not read captions, falling back to Whisper: {str(e)}")
+        return None
+    
+    if not transcript:
+        print("No usable caption track, falling back to Whisper")
+        return None
+    
+    track = transcript['caption_track']
+    kind = 'auto-generated' if track['automatic'] else 'manual'
+    print(f"✅ Using {kind} '{track['language']}' captions ({len(transcript['text'])} characters)")
+    return transcript
+
+def _downloaded_path(info, temp_dir):
+    """Locate the file yt-dlp wrote for `info`"""
+    for download in info.get('requested_downloads') or []:
+        path = download.get('filepath')
+        if path and os.path.exists(path):
+            return path
+    
+    downloaded_files = [f for f in os.listdir(temp_dir) if not f.endswith(('.part', '.ytdl'))]
+    if not downloaded_files:
+        raise ValueError("No media file was downloaded")
+    return os.path.join(temp_dir, downloaded_files[0])
+
+def extract_from_file(file_path, mode=None, model_size=None):
+    """
+    Transcribe a local audio/video file with the configured engine
+
+    `mode` overrides Config.TRANSCRIBE_MODE:
+      - "full": the whole recording (in windows for engines that cannot stream segments)
+      - "parallel": silence-aligned chunks transcribed across worker processes
+      - "streaming": windows read from an ffmpeg pipe, for recordings too long to decode in memory
+      - "budget": stop once the configured character/time budget is met
+      - "sampled": a few windows spread evenly across the recording
+    `model_size` defaults to Config.WHISPER_MODEL_SIZE.
+    """
+    mode = mode or Config.TRANSCRIBE_MODE
+    model_size = model_size or Config.WHISPER_MODEL_SIZE
+    print(f"Using {Config.TRANSCRIBE_ENGINE} engine, model '{model_size}'")
     try:
-        print(f"Loading Whisper model...")
-        model = whisper.load_model("base")
+        if mode == 'streaming':
+            return _extract_streaming(file_path, model_size)
         
-        print(f"Transcribing audio from: {file_path}")
-        result = model.transcribe(file_path)
+        if mode in PARTIAL_MODES:
+            print(f"Transcribing part of: {file_path} ({mode} mode)")
+            start_transcription(probe_duration(file_path))
+            if mode == 'budget':
+                result = transcribe_budget(file_path, model_size=model_size)
+            else:
+                result = transcribe_sampled(file_path, model_size=model_size)
+        else:
+            print(f"Decoding audio from: {file_path}")
+            report_stage('decode')
+            audio = decode_audio(file_path)
+            
+            print(f"Transcribing {len(audio) / WHISPER_SAMPLE_RATE:.0f}s of audio ({mode} mode)")
+            start_transcription(len(audio) / WHISPER_SAMPLE_RATE)
+            if mode == 'parallel':
+                result = transcribe_parallel(audio, model_size=model_size)
+            elif not get_engine().streams_segments:
+                # openai-whisper reports nothing until a call ends; windows keep progress moving
+                # and, with pipelining, hand the leading transcript to generation early
+                lead_seconds = Config.PIPELINE_LEAD_SECONDS if Config.PIPELINED_GENERATION else None
+                result = transcribe_windowed(audio, lead_seconds=lead_seconds, model_size=model_size)
+            else:
+                result = transcribe_audio(audio, model_size=model_size)
         
         transcript_text = result["text"]
-        segments = []
-        
-        for segment in result.get("segments", []):
-            segments.append({
-                "start": segment["start"],
-                "end": segment["end"],
-                "text": segment["text"]
-            })
-        
         print(f"Transcription completed. Text length: {len(transcript_text)} characters")
         
-        return {
+        transcript = {
             "text": transcript_text,
-            "segments": segments,
-            "title": None  # Will be set by extract_from_youtube if available
+            "segments": result["segments"],
+            "title": None,  # Will be set by extract_from_youtube if available
+            "source": "whisper",
+            "engine": Config.TRANSCRIBE_ENGINE,
+            "model_size": model_size
         }
+        if mode in PARTIAL_MODES:
+            transcript["partial"] = True
+            transcript["coverage"] = result["coverage"]
+        if Config.VAD_ENABLED:
+            transcript["vad"] = _vad_report(result.get("vad"))
+        return transcript
     except Exception as e:
         print(f"Transcription error: {str(e)}")
         raise Exception(f"Transcription failed: {str(e)}")
+
+def _extract_streaming(file_path, model_size):
+    print(f"Streaming transcription of: {file_path}")
+    start_transcription(probe_duration(file_path))
+    segments = []
+    vad_stats = {}
+    for segment in stream_transcribe(file_path, vad_stats=vad_stats, model_size=model_size):
+        segments.append(segment)
+        print(f"[{segment['start']:.1f}s -> {segment['end']:.1f}s]{segment['text']}")
+    
+    transcript_text = ''.join(segment["text"] for segment in segments)
+    print(f"Transcription completed. Text length: {len(transcript_text)} characters")
+    
+    transcript = {
+        "text": transcript_text,
+        "segments": segments,
+        "title": None,
+        "source": "whisper",
+        "engine": Config.TRANSCRIBE_ENGINE,
+        "model_size": model_size
+    }
+    if Config.VAD_ENABLED:
+        transcript["vad"] = _vad_report(vad_stats)
+    return transcript
+
+def _vad_report(stats):
+    """Speech ratio of the audio that went through voice activity detection"""
+    stats = stats or {}
+    audio_seconds = stats.get("audio_seconds", 0.0)
+    speech_seconds = stats.get("speech_seconds", 0.0)
+    ratio = speech_seconds / audio_seconds if audio_seconds else None
+    if ratio is not None:
+        print(f"🗣️ VAD: {speech_seconds:.0f}s of speech in {audio_seconds:.0f}s of audio ({ratio:.0%})")
+    return {
+        "audio_seconds": round(audio_seconds, 2),
+        "speech_seconds": round(speech_seconds, 2),
+        "speech_ratio": round(ratio, 3) if ratio is not None else None
+    }
@@ -0,0 +1,154 @@
+"""Process-wide registry of loaded speech-to-text models"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+import whisper
+from app.config import Config
+
+_registry_lock = threading.Lock()
+_models = {}       # (engine, size) -> loaded model
+_load_locks = {}   # (engine, size) -> lock held while the checkpoint loads
+_use_locks = {}    # (engine, size) -> lock held while the model transcribes
+_stats = {}        # "engine:size" -> load time / resident size
+
+
+def _lock_for(table, key):
+    with _registry_lock:
+        if key not in table:
+            table[key] = threading.Lock()
+        return table[key]
+
+
+def _rss_bytes():
+    """Current resident set size of this process (Linux), or None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _torch_model_bytes(model):
+    """Resident size of a torch model's weights and buffers in bytes"""
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def thread_share(workers):
+    """Inference threads for each of `workers` child processes, from this process's own share of the CPU"""
+    # Inside a job worker TRANSCRIBE_THREADS is already that worker's share, so nested pools do not oversubscribe
+    budget = Config.TRANSCRIBE_THREADS or os.cpu_count() or 1
+    return max(1, budget // workers)
+
+
+def use_thread_share(threads):
+    """In a freshly spawned worker: run inference on `threads` threads unless TRANSCRIBE_THREADS is configured"""
+    # Workers are spawned, so this only changes the copy of Config in each worker
+    if not Config.TRANSCRIBE_THREADS:
+        Config.TRANSCRIBE_THREADS = threads
+
+
+def _load_whisper(size):
+    if Config.TRANSCRIBE_THREADS:
+        import torch
+        torch.set_num_threads(Config.TRANSCRIBE_THREADS)
+    return whisper.load_model(size)
+
+
+def _load_faster_whisper(size):
+    try:
+        from faster_whisper import WhisperModel
+    except ImportError:
+        raise Exception("The faster-whisper engine requires the faster-whisper package "
+                        "(pip install faster-whisper)")
+    return WhisperModel(
+        size,
+        device='cpu',
+        compute_type=Config.WHISPER_COMPUTE_TYPE,
+        cpu_threads=Config.TRANSCRIBE_THREADS,
+    )
+
+
+_LOADERS = {
+    'whisper': _load_whisper,
+    'faster-whisper': _load_faster_whisper,
+}
+
+
+def get_model(size=None, engine=None):
+    """Return the model for `engine`/`size`, loading it once per process"""
+    size = size or Config.WHISPER_MODEL_SIZE
+    engine = engine or Config.TRANSCRIBE_ENGINE
+    key = (engine, size)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    if engine not in _LOADERS:
+        raise Exception(f"Unknown transcription engine: {engine}")
+
+    # Only one thread loads a given model; the others wait and reuse it
+    with _lock_for(_load_locks, key):
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        print(f"Loading {engine} model '{size}'...")
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        model = _LOADERS[engine](size)
+        load_seconds = time.perf_counter() - started
+        rss_after = _rss_bytes()
+
+        if engine == 'whisper':
+            resident_bytes = _torch_model_bytes(model)
+        elif rss_before is not None and rss_after is not None:
+            resident_bytes = max(0, rss_after - rss_before)
+        else:
+            resident_bytes = None
+
+        _stats[f"{engine}:{size}"] = {
+            'engine': engine,
+            'size': size,
+            'load_seconds': round(load_seconds, 3),
+            'resident_bytes': resident_bytes,
+            'loaded_at': time.time(),
+        }
+        _models[key] = model
+        size_note = f" ({resident_bytes / 1e6:.0f} MB)" if resident_bytes else ""
+        print(f"✅ {engine} model '{size}' loaded in {load_seconds:.2f}s{size_note}")
+        return model
+
+
+@contextmanager
+def acquire_model(size=None, engine=None):
+    """
+    Borrow a shared model for one transcription.
+
+    Whisper installs per-call hooks on the model while decoding, so two
+    threads must not transcribe with the same instance at the same time.
+    """
+    size = size or Config.WHISPER_MODEL_SIZE
+    engine = engine or Config.TRANSCRIBE_ENGINE
+    model = get_model(size, engine)
+    with _lock_for(_use_locks, (engine, size)):
+        yield model
+
+
+def preload_models(sizes=None):
+    """Load the configured model sizes up front so the first job is not a cold start"""
+    if sizes is None:
+        sizes = [s.strip() for s in Config.WHISPER_PRELOAD_MODELS.split(',') if s.strip()]
+    for size in sizes:
+        try:
+            get_model(size)
+        except Exception as e:
+            print(f"⚠️ Failed to preload model '{size}': {str(e)}")
+
+
+def get_model_stats():
+    """Load time and resident size for every model loaded in this process"""
+    return {key: dict(stats) for key, stats in _stats.items()}